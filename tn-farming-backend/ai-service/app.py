@@ -1,91 +1,179 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from PIL import Image
-import numpy as np
-import tensorflow as tf
-import io
+import hmac
 import os
+import tarfile
+import time
 import traceback
-import json
+import zipfile
 
-# ✅ IMPORT pesticide engine
-from pesticide_engine import calculate_pesticide
+import inference_service as service
+import metrics
+import tracing
+import uploads
+from decode_stage import DecodeQueueFull
+from uploads import UploadBudgetExhausted, UploadRejected
 
 
 app = Flask(__name__)
 CORS(app)
 
+# Hard cap on any request body (a full /predict/batch); Werkzeug refuses
+# anything larger from Content-Length alone, before reading it
+app.config["MAX_CONTENT_LENGTH"] = uploads.UPLOAD_MAX_BYTES * service.BATCH_MAX_IMAGES
+
 # ==============================
 # CONFIG
 # ==============================
+# Model, batching and decode settings live in inference_service.py and are
+# shared with the async variant (app_async.py).
 
-MODEL_PATH = "models/plant_disease_model.keras"
-CLASS_NAMES_PATH = "models/class_names.json"
-
-model = None
-CLASS_NAMES = []
+PORT = int(os.environ.get("PORT", 5001))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
 
 
 # ==============================
-# LOAD MODEL
+# BATCH UPLOAD HELPERS
 # ==============================
 
-def load_model():
-    global model, CLASS_NAMES
+def collect_batch_uploads(reservation):
+    """Return [(filename, bytes, None) | (filename, None, error)] from a multipart list or a zip/tar archive
+
+    Every image goes through the same size cap and magic-byte sniff as
+    /predict; archive members are checked from their header size before
+    being inflated. A file that isn't an image is reported on its own, like
+    an undecodable one. Anything oversized, more than BATCH_MAX_IMAGES files,
+    or more inflated bytes than the upload budget allows (the reservation
+    grows as archives inflate) rejects the whole request.
+    """
+    files = []
+    total_bytes = 0
+
+    def add(name, read):
+        nonlocal total_bytes
+        if len(files) >= service.BATCH_MAX_IMAGES:
+            raise UploadRejected(f"Too many images, max is {service.BATCH_MAX_IMAGES}", 413)
+
+        try:
+            data = read()
+        except UploadRejected as e:
+            if e.status != 415:
+                raise UploadRejected(f"{name}: {e}", e.status)
+            files.append((name, None, str(e)))
+            return
+
+        total_bytes += len(data)
+        if total_bytes > reservation.held:
+            reservation.extend(total_bytes - reservation.held)
+        files.append((name, data, None))
+
+    for part in request.files.getlist("images"):
+        add(part.filename, lambda: uploads.read_file(part.stream))
+
+    archive = request.files.get("archive")
+    if archive is not None:
+        try:
+            read_archive(archive, add)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise UploadRejected(f"Unreadable archive: {e}", 400)
+
+    return files
+
+
+def read_archive(archive, add):
+    """add(name, read) for every image member of a zip or (gzip'd) tar upload"""
+    name = (archive.filename or "").lower()
+
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(archive.stream) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    with zf.open(info) as member:
+                        add(info.filename, lambda: uploads.read_member(member, info.file_size))
+    else:
+        # Tar is read as a stream, member by member
+        with tarfile.open(fileobj=archive.stream, mode="r|*") as tf_archive:
+            for member in tf_archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stream = tf_archive.extractfile(member)
+                    add(member.name, lambda: uploads.read_member(stream, member.size))
 
-    try:
-        # Load class names
-        if not os.path.exists(CLASS_NAMES_PATH):
-            print("❌ class_names.json not found")
-            return False
 
-        with open(CLASS_NAMES_PATH, "r") as f:
-            CLASS_NAMES = json.load(f)
+def upload_limit(tensor=False):
+    """Largest /predict body accepted for this request's Content-Type"""
+    if tensor:
+        return service.tensor_nbytes()
+    if uploads.is_raw_image(request.mimetype):
+        return uploads.UPLOAD_MAX_BYTES
+    return uploads.UPLOAD_MAX_BYTES + uploads.MULTIPART_SLACK
 
-        print(f"📁 Loaded {len(CLASS_NAMES)} class names")
 
-        # Load model (.keras format only)
-        if not os.path.exists(MODEL_PATH):
-            print("❌ Model file not found:", MODEL_PATH)
-            return False
+def read_image_upload(tensor=False):
+    """The /predict image: a raw image body, or the multipart "image" field (None if absent)
 
-        print("🌿 Loading trained model...")
-        model = tf.keras.models.load_model(MODEL_PATH)
+    A raw body (Content-Type: image/jpeg ...) is received straight into one
+    buffer; multipart goes through Werkzeug's parser first. tensor=True reads
+    a raw pixel body, capped at the model's tensor size.
+    """
+    if tensor:
+        return uploads.read_stream(request.stream, request.content_length, upload_limit(tensor), sniff=False)
 
-        print("✅ Model loaded successfully")
-        print("📊 Input shape:", model.input_shape)
-        print("📊 Output shape:", model.output_shape)
+    if uploads.is_raw_image(request.mimetype):
+        return uploads.read_stream(request.stream, request.content_length)
 
-        return True
+    uploads.check_length(request.content_length, upload_limit())
 
-    except Exception as e:
-        print("❌ Model loading failed:", e)
-        traceback.print_exc()
-        return False
+    # Touching request.files parses (i.e. receives) the whole multipart body
+    if "image" not in request.files:
+        return None
+
+    return uploads.read_file(request.files["image"].stream)
+
+
+def not_ready_response():
+    if service.model_state == "loading":
+        response = jsonify({"success": False, "error": "Model is loading, retry shortly"})
+        response.headers["Retry-After"] = "2"
+        return response, 503
+
+    return jsonify({"success": False, "error": "Model not loaded"}), 500
+
+
+def busy_response(error):
+    response = jsonify({"success": False, "error": f"Server busy, retry shortly ({error})"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
 
 
 # ==============================
-# IMAGE PREPROCESSING
+# REQUEST METRICS
 # ==============================
 
-def preprocess_image(image_bytes):
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
 
-        if image.mode != "RGB":
-            image = image.convert("RGB")
 
-        image = image.resize((224, 224))
+@app.after_request
+def record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None and request.endpoint != "prometheus_metrics":
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else "other",
+            status=response.status_code
+        )
+    return response
 
-        img_array = np.array(image, dtype=np.float32)
-        img_array = img_array / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
 
-        return img_array
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({"success": False, "error": "Request body too large"}), 413
 
-    except Exception as e:
-        print("❌ Image preprocessing error:", e)
-        raise
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 # ==============================
@@ -94,13 +182,7 @@ def preprocess_image(image_bytes):
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({
-        "status": "running",
-        "model_loaded": model is not None,
-        "classes": len(CLASS_NAMES),
-        "input_shape": str(model.input_shape) if model else None,
-        "output_shape": str(model.output_shape) if model else None
-    })
+    return jsonify(service.health_info())
 
 
 # ==============================
@@ -110,82 +192,171 @@ def health():
 @app.route("/predict", methods=["POST"])
 def predict():
 
-    if model is None:
-        return jsonify({"success": False, "error": "Model not loaded"}), 500
+    if not service.model_ready:
+        return not_ready_response()
 
-    if "image" not in request.files:
-        return jsonify({"success": False, "error": "No image provided"}), 400
+    # Opt-in per-stage breakdown (TRACE_MODE), returned under "debug"
+    trace = tracing.start_trace(request.headers.get(tracing.TRACE_HEADER))
 
     try:
-        image_file = request.files["image"]
-        image_bytes = image_file.read()
-
-        img_array = preprocess_image(image_bytes)
-
-        predictions = model.predict(img_array, verbose=0)[0]
-
         # Ensure prediction length matches class list
-        if len(predictions) != len(CLASS_NAMES):
+        if not service.class_count_matches():
             return jsonify({
                 "success": False,
                 "error": "Class count mismatch between model and class_names.json"
             }), 500
 
-        top_3_idx = np.argsort(predictions)[-3:][::-1]
+        # Oversized bodies are refused from the header. Budget is reserved
+        # before any of the body is received and held until the prediction is
+        # done, bounding upload memory across a burst
+        tensor = uploads.is_raw_tensor(request.mimetype)
+        uploads.check_length(request.content_length, upload_limit(tensor))
 
-        results = []
-        for idx in top_3_idx:
-            results.append({
-                "class": CLASS_NAMES[idx],
-                "confidence": round(float(predictions[idx]) * 100, 2)
-            })
+        with uploads.reserve(request.content_length):
+            read_started = time.perf_counter()
+            image_bytes = read_image_upload(tensor)
 
-        return jsonify({
-            "success": True,
-            "prediction": {
-                "primary": results[0],
-                "top_3": results
+            if image_bytes is None:
+                return jsonify({"success": False, "error": "No image provided"}), 400
+
+            tracing.record_stage("upload_read", time.perf_counter() - read_started, trace)
+
+            # Decode runs on the decode pool; this thread only waits for the result
+            body = {
+                "success": True,
+                "prediction": service.predict_image(image_bytes, trace, tensor)
             }
-        })
+
+        if trace is not None:
+            body["debug"] = tracing.finish_trace(trace)
+
+        return jsonify(body)
+
+    except UploadRejected as e:
+        metrics.count_error("predict", e)
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    except (DecodeQueueFull, UploadBudgetExhausted) as e:
+        metrics.count_error("predict", e)
+        return busy_response(e)
 
     except Exception as e:
         print("❌ Prediction error:", e)
         traceback.print_exc()
+        metrics.count_error("predict", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Input size, JPEG quality and accepted formats, for on-device downscaling
+@app.route("/predict/config", methods=["GET"])
+def predict_config():
+    if not service.model_ready:
+        return not_ready_response()
+
+    response = jsonify({"success": True, "config": service.client_config()})
+    response.headers["Cache-Control"] = "max-age=300"
+    return response
+
+
 # ==============================
-# PESTICIDE RECOMMENDATION
+# BATCH PREDICTION
 # ==============================
 
-@app.route("/pesticide", methods=["POST"])
-def pesticide_recommend():
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+
+    if not service.model_ready:
+        return not_ready_response()
+
     try:
-        data = request.json
+        with uploads.reserve(request.content_length) as reservation:
+            with metrics.STAGE_SECONDS.time(stage="upload_read"):
+                files = collect_batch_uploads(reservation)
 
-        disease = data.get("disease")
-        area = float(data.get("area_sqft"))
-        severity = data.get("severity", "moderate")
+            if not files:
+                return jsonify({"success": False, "error": "No images provided"}), 400
 
-        result = calculate_pesticide(disease, area, severity)
+            if not service.class_count_matches():
+                return jsonify({
+                    "success": False,
+                    "error": "Class count mismatch between model and class_names.json"
+                }), 500
 
-        if not result:
-            return jsonify({
-                "success": False,
-                "message": "No pesticide data found"
-            }), 404
+            outcomes = iter(service.predict_images([data for _, data, error in files if error is None]))
+
+        results = []
+        for filename, _, error in files:
+            prediction, error = (None, error) if error else next(outcomes)
+            if prediction is None:
+                results.append({"filename": filename, "success": False, "error": error})
+            else:
+                results.append({"filename": filename, "success": True, "prediction": prediction})
 
         return jsonify({
             "success": True,
-            "recommendation": result
+            "count": len(results),
+            "results": results
         })
 
+    except UploadRejected as e:
+        metrics.count_error("predict_batch", e)
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    except (DecodeQueueFull, UploadBudgetExhausted) as e:
+        metrics.count_error("predict_batch", e)
+        return busy_response(e)
+
     except Exception as e:
-        print("❌ Pesticide calculation error:", e)
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        print("❌ Batch prediction error:", e)
+        traceback.print_exc()
+        metrics.count_error("predict_batch", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# ==============================
+# MODEL ADMIN (hot reload)
+# ==============================
+
+def admin_allowed():
+    token = service.ADMIN_TOKEN
+    if not token:
+        return False
+
+    # Constant-time, so the token can't be guessed a byte at a time; bytes
+    # because compare_digest refuses non-ASCII str
+    supplied = request.headers.get("X-Admin-Token") or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+@app.route("/admin/models", methods=["GET"])
+def admin_models():
+    if not admin_allowed():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    return jsonify(service.registry_info())
+
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    if not admin_allowed():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    if service.reload_status["in_progress"]:
+        return jsonify({"success": False, "error": "Reload already in progress"}), 409
+
+    data = request.get_json(silent=True)
+    body, status = service.reload_request({} if data is None else data)
+    return jsonify(body), status
+
+
+# ==============================
+# PESTICIDE RECOMMENDATION
+# ==============================
+
+@app.route("/pesticide", methods=["POST"])
+def pesticide_recommend():
+    body, status = service.pesticide_recommendation(request.get_json(silent=True) or {})
+    return jsonify(body), status
 
 
 # ==============================
@@ -195,8 +366,17 @@ def pesticide_recommend():
 if __name__ == "__main__":
     print("\n🌿 Plant Disease AI Service Starting...\n")
 
-    if load_model():
-        print("🚀 Server running at http://localhost:5001")
-        app.run(host="0.0.0.0", port=5001, debug=False)
+    # kill -USR2 <pid> reloads the registry's ACTIVE version
+    service.install_reload_signal()
+
+    if service.MODEL_LOAD_MODE == "background":
+        # Port opens immediately; /health reports "loading" until warm-up is done
+        service.start_background_load()
+        print(f"🚀 Server running at http://localhost:{PORT} (model loading in background)")
+        app.run(host="0.0.0.0", port=PORT, debug=False, threaded=True)
+
+    elif service.load_model():
+        print(f"🚀 Server running at http://localhost:{PORT}")
+        app.run(host="0.0.0.0", port=PORT, debug=False, threaded=True)
     else:
         print("❌ Server not started — model failed to load.")
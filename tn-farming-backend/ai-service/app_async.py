@@ -0,0 +1,297 @@
+import asyncio
+import hmac
+import time
+import traceback
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import inference_service as service
+import metrics
+import tracing
+import uploads
+from decode_stage import DecodeQueueFull
+from uploads import UploadBudgetExhausted, UploadRejected
+
+
+# ==============================
+# ASYNC (ASGI) VARIANT
+# ==============================
+# Same /health, /metrics, /predict, /predict/config, /admin and /pesticide
+# contract as app.py, served by an event loop: slow mobile uploads are read
+# from the socket without holding a thread, and inference is awaited on the
+# decode pool / micro-batcher futures. /predict/batch (multipart lists and
+# zip/tar archives) is only served by app.py.
+#
+# Run with:  uvicorn app_async:app --host 0.0.0.0 --port 5001 --workers 2
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if not service.model_ready:
+        print("\n🌿 Plant Disease AI Service Starting (async)...\n")
+
+        if service.MODEL_LOAD_MODE == "background":
+            service.start_background_load()
+        else:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, service.load_model):
+                raise RuntimeError("Model failed to load")
+
+    yield
+
+    service.shutdown()
+
+
+async def read_image_upload(request, length, tensor=False):
+    """The /predict image: a raw image body, or the multipart "image" field (None if absent)
+
+    A raw body (Content-Type: image/jpeg ...) is streamed chunk by chunk into
+    one buffer; multipart is parsed by Starlette (spooled to disk past 1 MB).
+    tensor=True reads a raw pixel body, capped at the model's tensor size.
+    """
+    if tensor:
+        body = uploads.BodyBuffer(length, service.tensor_nbytes(), sniff=False)
+        async for chunk in request.stream():
+            body.feed(chunk)
+        return body.finish()
+
+    if uploads.is_raw_image(request.headers.get("content-type")):
+        body = uploads.BodyBuffer(length)
+        async for chunk in request.stream():
+            body.feed(chunk)
+        return body.finish()
+
+    uploads.check_length(length, uploads.UPLOAD_MAX_BYTES + uploads.MULTIPART_SLACK)
+
+    async with request.form(max_files=1) as form:
+        upload = form.get("image")
+
+        if upload is None or isinstance(upload, str):
+            return None
+
+        return await run_in_threadpool(uploads.read_file, upload.file)
+
+
+def not_ready_response():
+    if service.model_state == "loading":
+        return JSONResponse(
+            {"success": False, "error": "Model is loading, retry shortly"},
+            status_code=503,
+            headers={"Retry-After": "2"}
+        )
+
+    return JSONResponse({"success": False, "error": "Model not loaded"}, status_code=500)
+
+
+def busy_response(error):
+    return JSONResponse(
+        {"success": False, "error": f"Server busy, retry shortly ({error})"},
+        status_code=503,
+        headers={"Retry-After": "1"}
+    )
+
+
+# ==============================
+# REQUEST METRICS
+# ==============================
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware: latency by route and status, no body buffering"""
+
+    def __init__(self, app, paths=()):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=scope["path"] if scope["path"] in self.paths else "other",
+                status=status["code"]
+            )
+
+
+async def prometheus_metrics(request):
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ==============================
+# HEALTH CHECK
+# ==============================
+
+async def health(request):
+    return JSONResponse(service.health_info())
+
+
+# ==============================
+# PREDICTION
+# ==============================
+
+async def predict(request):
+
+    if not service.model_ready:
+        return not_ready_response()
+
+    held = 0
+    try:
+        trace = tracing.start_trace(request.headers.get(tracing.TRACE_HEADER))
+
+        if not service.class_count_matches():
+            return JSONResponse({
+                "success": False,
+                "error": "Class count mismatch between model and class_names.json"
+            }, status_code=500)
+
+        length = uploads.parse_length(request.headers.get("content-length"))
+
+        # Oversized bodies are refused from the header; budget is reserved
+        # before any of the body is received, waiting on the event loop rather
+        # than in the thread pool that submit_prediction below needs
+        uploads.check_length(length, uploads.UPLOAD_MAX_BYTES + uploads.MULTIPART_SLACK)
+        held = await uploads.upload_budget.acquire_async(
+            uploads.reservation_size(length), uploads.UPLOAD_ADMIT_TIMEOUT_MS / 1000
+        )
+
+        read_started = time.perf_counter()
+        tensor = uploads.is_raw_tensor(request.headers.get("content-type"))
+        image_bytes = await read_image_upload(request, length, tensor)
+
+        if image_bytes is None:
+            return JSONResponse({"success": False, "error": "No image provided"}, status_code=400)
+
+        tracing.record_stage("upload_read", time.perf_counter() - read_started, trace)
+
+        # Admission can wait for a decode slot, so it runs off the event loop;
+        # the decode + inference itself is just awaited
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, service.submit_prediction, image_bytes, trace, tensor)
+        body = {
+            "success": True,
+            "prediction": await asyncio.wrap_future(future)
+        }
+
+        if trace is not None:
+            body["debug"] = tracing.finish_trace(trace)
+
+        return JSONResponse(body)
+
+    except UploadRejected as e:
+        metrics.count_error("predict", e)
+        return JSONResponse({"success": False, "error": str(e)}, status_code=e.status)
+
+    except (DecodeQueueFull, UploadBudgetExhausted) as e:
+        metrics.count_error("predict", e)
+        return busy_response(e)
+
+    except Exception as e:
+        print("❌ Prediction error:", e)
+        traceback.print_exc()
+        metrics.count_error("predict", e)
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    finally:
+        if held:
+            uploads.upload_budget.release(held)
+
+
+# Input size, JPEG quality and accepted formats, for on-device downscaling
+async def predict_config(request):
+    if not service.model_ready:
+        return not_ready_response()
+
+    return JSONResponse(
+        {"success": True, "config": service.client_config()},
+        headers={"Cache-Control": "max-age=300"}
+    )
+
+
+# ==============================
+# MODEL ADMIN (hot reload)
+# ==============================
+
+def admin_allowed(request):
+    token = service.ADMIN_TOKEN
+    if not token:
+        return False
+
+    # Constant-time, so the token can't be guessed a byte at a time; bytes
+    # because compare_digest refuses non-ASCII str
+    supplied = request.headers.get("x-admin-token") or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+async def admin_models(request):
+    if not admin_allowed(request):
+        return JSONResponse({"success": False, "error": "Forbidden"}, status_code=403)
+
+    return JSONResponse(service.registry_info())
+
+
+async def admin_reload(request):
+    if not admin_allowed(request):
+        return JSONResponse({"success": False, "error": "Forbidden"}, status_code=403)
+
+    if service.reload_status["in_progress"]:
+        return JSONResponse({"success": False, "error": "Reload already in progress"}, status_code=409)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+
+    body, status = service.reload_request({} if data is None else data)
+    return JSONResponse(body, status_code=status)
+
+
+# ==============================
+# PESTICIDE RECOMMENDATION
+# ==============================
+
+async def pesticide_recommend(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+
+    body, status = service.pesticide_recommendation(data or {})
+    return JSONResponse(body, status_code=status)
+
+
+routes = [
+    Route("/health", health, methods=["GET"]),
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+    Route("/predict", predict, methods=["POST"]),
+    Route("/predict/config", predict_config, methods=["GET"]),
+    Route("/admin/models", admin_models, methods=["GET"]),
+    Route("/admin/reload", admin_reload, methods=["POST"]),
+    Route("/pesticide", pesticide_recommend, methods=["POST"]),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+        Middleware(RequestMetricsMiddleware, paths=[route.path for route in routes])
+    ],
+    lifespan=lifespan
+)
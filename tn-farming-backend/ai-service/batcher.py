@@ -0,0 +1,195 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+from preprocessing import to_model_input
+from tracing import record_stage, start_profiler
+
+
+# ==============================
+# DYNAMIC MICRO-BATCHING
+# ==============================
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collect concurrent requests into one forward pass
+
+    With a format_fn (outputs -> one result per row), items submitted with
+    formatted=True also get their rows formatted, once per batch, so the
+    vectorized postprocessing covers micro-batched requests too.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=10, format_fn=None):
+        self.predict_fn = predict_fn
+        self.format_fn = format_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._buffer = None
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Start the inference worker thread (idempotent, but not after stop())"""
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Micro-batcher is stopped")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Finish everything already queued, then let the worker thread exit"""
+        with self._lock:
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(_STOP)
+
+    def submit(self, img_array, trace=None, formatted=False):
+        """Queue an (N, H, W, C) array and return a Future for its N output rows
+
+        With formatted=True the Future holds (rows, formatted rows), the
+        latter None if the batcher has no format_fn.
+        """
+        future = Future()
+        # Under the lock so nothing can be queued behind _STOP
+        with self._lock:
+            self.start()
+            self._queue.put((img_array, future, time.perf_counter(), trace, formatted))
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Blocking helper: submit a single image and wait for its prediction row"""
+        return self.submit(img_array).result(timeout=timeout)[0]
+
+    def predict_many(self, img_batch, timeout=None):
+        """Blocking helper: submit a stacked batch and wait for all its rows"""
+        return self.submit(img_batch).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # ------------------------------
+    # WORKER
+    # ------------------------------
+
+    def _collect(self):
+        """(batch, stop requested) — stops only after queued items are batched"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+
+        # A single oversized item (e.g. /predict/batch) still runs on its own
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed — still take anything already waiting
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if item is _STOP:
+                return batch, True
+
+            batch.append(item)
+            rows += len(item[0])
+
+        return batch, False
+
+    def _stage_inputs(self, batch):
+        """Normalize every item straight into one reusable float32 batch buffer"""
+        rows = sum(len(item[0]) for item in batch)
+        item_shape = batch[0][0].shape[1:]
+
+        if self._buffer is None or self._buffer.shape[1:] != item_shape or len(self._buffer) < rows:
+            self._buffer = np.empty((max(rows, self.max_batch_size),) + item_shape, dtype=np.float32)
+
+        inputs = self._buffer[:rows]
+        start = 0
+        for img_array, *_ in batch:
+            end = start + len(img_array)
+            to_model_input(img_array, out=inputs[start:end])
+            start = end
+
+        return inputs
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        traces = [trace for _, _, _, trace, _ in batch if trace is not None]
+        for _, _, queued_at, trace, _ in batch:
+            record_stage("batch_wait", started - queued_at, trace)
+
+        profiler = start_profiler() if any(t.profile for t in traces) else None
+
+        try:
+            inputs = self._stage_inputs(batch)
+            staged = time.perf_counter()
+            outputs = self.predict_fn(inputs)
+            finished = time.perf_counter()
+
+            # Batch-level stages count once in /metrics but show on every traced request
+            metrics.STAGE_SECONDS.observe(staged - started, stage="preprocess")
+            metrics.STAGE_SECONDS.observe(finished - staged, stage="inference")
+            metrics.BATCH_SIZE.observe(len(inputs))
+            for trace in traces:
+                trace.add("preprocess", staged - started)
+                trace.add("inference", finished - staged)
+                trace.note("batch_size", len(inputs))
+
+            formatted = None
+            if self.format_fn is not None and any(wants_format for *_, wants_format in batch):
+                formatted = self.format_fn(outputs)
+                formatted_at = time.perf_counter()
+                metrics.STAGE_SECONDS.observe(formatted_at - finished, stage="postprocess")
+                for trace in traces:
+                    trace.add("postprocess", formatted_at - finished)
+
+            start = 0
+            for img_array, future, _, _, wants_format in batch:
+                end = start + len(img_array)
+                if wants_format:
+                    future.set_result((outputs[start:end], formatted[start:end] if formatted is not None else None))
+                else:
+                    future.set_result(outputs[start:end])
+                start = end
+
+        except Exception as e:
+            print("❌ Batch inference error:", e)
+            traceback.print_exc()
+            metrics.count_error("inference", e)
+            for _, future, *_ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                for trace in traces:
+                    if trace.profile:
+                        trace.add_profile(profiler)
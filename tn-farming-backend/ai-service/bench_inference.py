@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Pure forward-pass latency and images/sec per backend, batch size and
+# thread count — no HTTP, no decode. Use it to pick MODEL_BACKEND,
+# INTRA_OP_THREADS and BATCH_MAX_SIZE / BATCH_MAX_WAIT_MS for a VM size.
+#
+# python bench_inference.py
+# python bench_inference.py --backends onnx tflite-int8 --threads 1 2 4
+#
+# Each (backend, threads) pair runs in its own subprocess: TensorFlow only
+# honours thread settings made before its runtime starts.
+
+REPORT_DIR = "benchmarks"
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+WARMUP_RUNS = 3
+TIMED_RUNS = 20
+
+# keras-predict is the original serving call (model.predict), for reference
+# against the traced tf.function that KerasBackend serves through
+BENCH_BACKENDS = ["keras", "keras-predict", "tflite-fp16", "tflite-int8", "onnx"]
+
+
+def default_thread_counts():
+    cpus = os.cpu_count() or 1
+    return sorted({1, 2, max(1, cpus // 2), cpus})
+
+
+# ==============================
+# ONE CONFIGURATION (child process)
+# ==============================
+
+def load_for_bench(name, threads):
+    from inference_backends import MODEL_BACKENDS, load_backend
+
+    if name == "keras-predict":
+        backend = load_backend("keras", intra_op_threads=threads, inter_op_threads=1)
+        keras_model = backend.model
+        return lambda batch: keras_model.predict(batch, verbose=0), backend.input_shape
+
+    if not os.path.exists(MODEL_BACKENDS[name]):
+        raise FileNotFoundError(f"{MODEL_BACKENDS[name]} not found")
+
+    backend = load_backend(name, intra_op_threads=threads, inter_op_threads=1)
+    return backend.predict, backend.input_shape
+
+
+def time_predict(predict, input_shape, batch_sizes, warmup_runs=WARMUP_RUNS, timed_runs=TIMED_RUNS):
+    """{batch size: latency p50/p95, ms per image, images/sec} for one predict function"""
+    rng = np.random.default_rng(0)
+    rows = {}
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size,) + tuple(input_shape[1:]), dtype=np.float32)
+
+        for _ in range(warmup_runs):
+            predict(batch)
+
+        times = []
+        for _ in range(timed_runs):
+            start = time.perf_counter()
+            predict(batch)
+            times.append(time.perf_counter() - start)
+
+        ms = np.array(times) * 1000
+        p50 = float(np.percentile(ms, 50))
+        rows[str(batch_size)] = {
+            "latency_ms_p50": round(p50, 2),
+            "latency_ms_p95": round(float(np.percentile(ms, 95)), 2),
+            "ms_per_image": round(p50 / batch_size, 3),
+            "images_per_sec": round(batch_size / (p50 / 1000), 1),
+        }
+
+    return rows
+
+
+def bench_config(name, threads, batch_sizes, warmup_runs=WARMUP_RUNS, timed_runs=TIMED_RUNS):
+    started = time.perf_counter()
+    predict, input_shape = load_for_bench(name, threads)
+    load_s = time.perf_counter() - started
+
+    rows = time_predict(predict, input_shape, batch_sizes, warmup_runs, timed_runs)
+    return {"load_s": round(load_s, 2), "batches": rows}
+
+
+# ==============================
+# ORCHESTRATION
+# ==============================
+
+def run_child(name, threads, batch_sizes, timed_runs):
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads), TF_CPP_MIN_LOG_LEVEL="2")
+    command = [
+        sys.executable, __file__, "--child", name, str(threads),
+        "--batch-sizes", *map(str, batch_sizes), "--runs", str(timed_runs)
+    ]
+    done = subprocess.run(command, env=env, capture_output=True, text=True)
+
+    # The result is the last stdout line; everything else is library noise
+    lines = done.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {"error": (done.stderr.strip().splitlines() or ["no output"])[-1]}
+
+
+def best_batch(rows):
+    """Largest throughput, and the smallest batch within 10% of it"""
+    peak = max(row["images_per_sec"] for row in rows.values())
+    knee = min(int(size) for size, row in rows.items() if row["images_per_sec"] >= 0.9 * peak)
+    return peak, knee
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline forward-pass benchmark per backend")
+    parser.add_argument("--backends", nargs="*", default=BENCH_BACKENDS)
+    parser.add_argument("--threads", type=int, nargs="*", default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=BATCH_SIZES)
+    parser.add_argument("--runs", type=int, default=TIMED_RUNS)
+    parser.add_argument("--out", default=None, help="report path (default benchmarks/inference-<time>.json)")
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "THREADS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.child:
+        name, threads = args.child[0], int(args.child[1])
+        try:
+            result = bench_config(name, threads, args.batch_sizes, timed_runs=args.runs)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        print(json.dumps(result))
+        sys.exit(0)
+
+    print("🌿 Inference micro-benchmark\n")
+
+    thread_counts = args.threads or default_thread_counts()
+    report = {}
+
+    for name in args.backends:
+        report[name] = {}
+        for threads in thread_counts:
+            result = run_child(name, threads, args.batch_sizes, args.runs)
+            report[name][str(threads)] = result
+
+            if "error" in result:
+                print(f"⏭️  {name} x{threads} threads: {result['error']}")
+                break
+
+            peak, knee = best_batch(result["batches"])
+            batch1 = result["batches"].get("1", {}).get("latency_ms_p50")
+            print(f"✅ {name} x{threads} threads: batch-1 p50 {batch1} ms, "
+                  f"peak {peak} img/s, 90% of peak from batch {knee}")
+
+    report_path = args.out or os.path.join(REPORT_DIR, f"inference-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({
+            "cpu_count": os.cpu_count(),
+            "batch_sizes": args.batch_sizes,
+            "runs": args.runs,
+            "results": report,
+        }, f, indent=2)
+
+    print(f"\n{'backend':<15}{'threads':>8}" + "".join(f"{'b' + str(b):>9}" for b in args.batch_sizes))
+    for name, by_threads in report.items():
+        for threads, result in by_threads.items():
+            if "error" in result:
+                continue
+            cells = "".join(f"{result['batches'][str(b)]['images_per_sec']:>9}" for b in args.batch_sizes)
+            print(f"{name:<15}{threads:>8}{cells}")
+    print("(images/sec per batch size)")
+
+    print(f"\n📁 Report saved: {report_path}")
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Training throughput and accuracy per precision / XLA combination, each in
+# its own subprocess (the Keras precision policy is process-global).
+#
+# python bench_training.py                      (full epochs, slow)
+# python bench_training.py --steps 100 --epochs 3
+#
+# Each run trains the head for HEAD_EPOCHS, then fine-tunes the last
+# FINE_TUNE_LAYERS backbone layers; images/sec is measured on the fine-tune
+# epochs after the first (which includes XLA compilation and cache fill).
+# Uses dataset_shards/ when built, else the tf.data image pipeline.
+
+REPORT_DIR = "benchmarks"
+
+TRAIN_PATH = "dataset/train"
+VAL_PATH = "dataset/val"
+
+IMG_SIZE = 224
+BATCH_SIZE = 32
+HEAD_EPOCHS = 1
+FINE_TUNE_EPOCHS = 2
+FINE_TUNE_LAYERS = 30
+
+COMBINATIONS = [("float32", False), ("float32", True), ("bfloat16", False), ("bfloat16", True)]
+
+
+# ==============================
+# ONE COMBINATION (child process)
+# ==============================
+
+def load_data(batch_size):
+    from data_pipeline import make_dataset, make_shard_dataset
+    from dataset_shards import INDEX_FILE, SHARDS_DIR, ShardedSplit
+    from dataset_utils import list_dataset
+
+    if os.path.exists(os.path.join(SHARDS_DIR, INDEX_FILE)):
+        train, class_names = make_shard_dataset(SHARDS_DIR, "train", IMG_SIZE, batch_size, training=True, seed=0)
+        val, _ = make_shard_dataset(SHARDS_DIR, "val", IMG_SIZE, batch_size)
+        return train, val, class_names, len(ShardedSplit(SHARDS_DIR, "train")), "shards"
+
+    train, class_names = make_dataset(TRAIN_PATH, IMG_SIZE, batch_size, training=True, seed=0)
+    val, _ = make_dataset(VAL_PATH, IMG_SIZE, batch_size)
+    return train, val, class_names, len(list_dataset(TRAIN_PATH)[0]), "tfdata"
+
+
+def bench_combination(precision, xla, epochs, steps, batch_size):
+    import tensorflow as tf
+
+    from data_pipeline import EpochTimer
+    from train_setup import bf16_supported, build_model, configure_precision, unfreeze_top
+
+    train, val, class_names, train_images, pipeline = load_data(batch_size)
+    if steps:
+        train = train.repeat()
+        train_images = steps * batch_size
+
+    configure_precision(precision)
+    tf.keras.utils.set_random_seed(0)
+    model, base_model, _ = build_model(len(class_names), IMG_SIZE)
+
+    def compile_and_fit(learning_rate, fit_epochs):
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            jit_compile=xla
+        )
+        timer = EpochTimer(train_images)
+        model.fit(train, epochs=fit_epochs, steps_per_epoch=steps or None, callbacks=[timer], verbose=0)
+        return timer
+
+    compile_and_fit(1e-3, HEAD_EPOCHS)
+
+    unfreeze_top(base_model, FINE_TUNE_LAYERS)
+    fine_tune = compile_and_fit(1e-4, epochs)
+
+    val_loss, val_accuracy = model.evaluate(val, verbose=0)
+
+    return {
+        "pipeline": pipeline,
+        "bf16_native": bf16_supported(),
+        "epoch_seconds": [e["seconds"] for e in fine_tune.epochs],
+        "images_per_sec": fine_tune.steady_images_per_sec(),
+        "val_accuracy": round(float(val_accuracy), 4),
+        "val_loss": round(float(val_loss), 4)
+    }
+
+
+# ==============================
+# ORCHESTRATION
+# ==============================
+
+def run_child(precision, xla, args):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="2")
+    command = [
+        sys.executable, __file__, "--child", precision, str(int(xla)),
+        "--epochs", str(args.epochs), "--steps", str(args.steps), "--batch-size", str(args.batch_size)
+    ]
+    done = subprocess.run(command, env=env, capture_output=True, text=True)
+
+    # The result is the last stdout line; everything else is training output
+    lines = done.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {"error": (done.stderr.strip().splitlines() or ["no output"])[-1]}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Training throughput per precision / XLA setting")
+    parser.add_argument("--epochs", type=int, default=FINE_TUNE_EPOCHS, help="fine-tune epochs per run")
+    parser.add_argument("--steps", type=int, default=0, help="steps per epoch (0 = whole dataset)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--force-bf16", action="store_true", help="also run bfloat16 without native CPU support")
+    parser.add_argument("--out", default=None, help="report path (default benchmarks/training-<time>.json)")
+    parser.add_argument("--child", nargs=2, metavar=("PRECISION", "XLA"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.child:
+        precision, xla = args.child[0], args.child[1] == "1"
+        try:
+            result = bench_combination(precision, xla, args.epochs, args.steps, args.batch_size)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        print(json.dumps(result))
+        sys.exit(0)
+
+    from train_setup import bf16_supported
+
+    print("🌿 Training benchmark (precision x XLA)\n")
+
+    native_bf16 = bf16_supported()
+    report = {}
+
+    for precision, xla in COMBINATIONS:
+        name = f"{precision}{'+xla' if xla else ''}"
+
+        if precision == "bfloat16" and not native_bf16 and not args.force_bf16:
+            print(f"⏭️  {name}: no native bfloat16 on this CPU (--force-bf16 to run anyway)")
+            continue
+
+        result = run_child(precision, xla, args)
+        report[name] = result
+
+        if "error" in result:
+            print(f"❌ {name}: {result['error']}")
+        else:
+            print(f"✅ {name}: {result['images_per_sec']} img/s, val accuracy {result['val_accuracy']}")
+
+    report_path = args.out or os.path.join(REPORT_DIR, f"training-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({
+            "cpu_count": os.cpu_count(),
+            "bf16_native": native_bf16,
+            "epochs": args.epochs,
+            "steps": args.steps,
+            "batch_size": args.batch_size,
+            "results": report,
+        }, f, indent=2)
+
+    print(f"\n{'setting':<16}{'img/s':>10}{'val acc':>10}")
+    for name, result in report.items():
+        if "error" not in result:
+            print(f"{name:<16}{result['images_per_sec']:>10}{result['val_accuracy']:>10}")
+
+    print(f"\n📁 Report saved: {report_path}")
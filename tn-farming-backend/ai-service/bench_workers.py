@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+
+from loadtest import (
+    ResourceSampler, load_mix, run_closed_loop, start_server, stop_server, wait_ready
+)
+
+print("🌿 Multi-worker serving benchmark\n")
+
+# ==============================
+# CONFIG
+# ==============================
+# Fixed-concurrency sweep over gunicorn worker counts; see loadtest.py for
+# open-loop arrival rates and the other servers.
+
+VAL_PATH = "dataset/val"
+REPORT_PATH = "benchmarks/workers.json"
+
+WORKER_COUNTS = [1, 2, 4, 8]
+CONCURRENCY = 16
+DURATION_S = 30
+PORT = 5055
+IMAGES_PER_CLASS = 5
+
+# Passed through to gunicorn.conf.py (MODEL_BACKEND, PRELOAD_MODEL, ...)
+SERVER_ENV = {k: v for k, v in os.environ.items()}
+
+# The same few images are replayed for the whole run, so with the prediction
+# cache and near-duplicate reuse on, req/s would measure cache lookups rather
+# than inference. Both are off unless --keep-cache (as in loadtest.py).
+NO_CACHE_ENV = {"CACHE_BACKEND": "off", "PHASH_MAX_DISTANCE": "-1"}
+
+
+# ==============================
+# RUN
+# ==============================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput per gunicorn worker count")
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="leave the prediction cache / near-duplicate reuse on (off by default "
+                             "so repeated images measure the full pipeline)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.keep_cache:
+        SERVER_ENV.update(NO_CACHE_ENV)
+
+    blobs = load_mix(VAL_PATH, IMAGES_PER_CLASS)
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    results = {}
+    for workers in WORKER_COUNTS:
+        server = start_server("gunicorn", PORT, dict(SERVER_ENV, WEB_WORKERS=str(workers)))
+
+        try:
+            if not wait_ready(base_url):
+                print(f"❌ {workers} workers: server never became ready")
+                continue
+
+            run_closed_loop(f"{base_url}/predict", blobs, CONCURRENCY, 3)  # warm every worker
+            with ResourceSampler(server.pid) as sampler:
+                results[workers] = run_closed_loop(f"{base_url}/predict", blobs, CONCURRENCY, DURATION_S)
+            results[workers]["processes"] = sampler.report()
+            print(f"✅ {workers} workers: {results[workers]['requests_per_sec']} req/s")
+        finally:
+            stop_server(server)
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        json.dump({
+            "cpu_count": os.cpu_count(),
+            "backend": SERVER_ENV.get("MODEL_BACKEND", "keras"),
+            "preload": SERVER_ENV.get("PRELOAD_MODEL", "0"),
+            "cache": args.keep_cache,
+            "concurrency": CONCURRENCY,
+            "duration_s": DURATION_S,
+            "results": results,
+        }, f, indent=2)
+
+    print(f"\n{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers, row in results.items():
+        print(f"{workers:>8}{row['requests_per_sec']:>10}{row['latency_ms_p50']:>10}{row['latency_ms_p99']:>10}")
+
+    print(f"\n📁 Report saved: {REPORT_PATH}")
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from dataset_utils import load_images, sample_dataset
+from inference_backends import MODEL_BACKENDS, load_backend
+
+print("🌿 Backend accuracy vs latency comparison\n")
+
+# ==============================
+# CONFIG
+# ==============================
+
+VAL_PATH = "dataset/val"
+CLASS_NAMES_PATH = "models/class_names.json"
+REPORT_PATH = "models/backend_report.json"
+
+EVAL_PER_CLASS = 50
+LATENCY_RUNS = 50
+THROUGHPUT_BATCH = 32
+
+# ==============================
+# EVALUATION DATA
+# ==============================
+
+with open(CLASS_NAMES_PATH, "r") as f:
+    class_names = json.load(f)
+
+paths, labels, folder_names = sample_dataset(VAL_PATH, EVAL_PER_CLASS)
+
+# Folder order and class_names.json order should match, but map by name to be safe
+labels = np.array([class_names.index(folder_names[l]) for l in labels])
+images = load_images(paths)
+
+print(f"📁 Evaluating on {len(images)} images from {VAL_PATH}\n")
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+# ==============================
+# RUN EVERY AVAILABLE BACKEND
+# ==============================
+
+report = {}
+reference_top1 = None
+
+for name, path in MODEL_BACKENDS.items():
+    if not os.path.exists(path):
+        print(f"⏭️  {name}: {path} not found, skipping")
+        continue
+
+    backend = load_backend(name)
+
+    predictions = np.concatenate([
+        backend.predict(images[i:i + THROUGHPUT_BATCH])
+        for i in range(0, len(images), THROUGHPUT_BATCH)
+    ])
+    top1 = predictions.argmax(axis=1)
+
+    if reference_top1 is None:
+        reference_top1 = top1
+
+    single = images[:1]
+    wide = images[:THROUGHPUT_BATCH]
+    backend.predict(single)
+    backend.predict(wide)
+
+    latency_1 = timed(lambda: backend.predict(single), LATENCY_RUNS)
+    latency_wide = timed(lambda: backend.predict(wide), max(5, LATENCY_RUNS // 5))
+
+    report[name] = {
+        "model_path": path,
+        "model_size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "accuracy": round(float((top1 == labels).mean()), 4),
+        "agreement_with_reference": round(float((top1 == reference_top1).mean()), 4),
+        "latency_ms_batch1_p50": round(float(np.percentile(latency_1, 50)), 2),
+        "latency_ms_batch1_p95": round(float(np.percentile(latency_1, 95)), 2),
+        f"images_per_sec_batch{THROUGHPUT_BATCH}": round(
+            len(wide) / (float(np.median(latency_wide)) / 1000), 1
+        ),
+    }
+
+    print(f"✅ {name}: {report[name]}")
+
+# ==============================
+# REPORT
+# ==============================
+
+with open(REPORT_PATH, "w") as f:
+    json.dump(report, f, indent=2)
+
+print(f"\n{'backend':<14}{'size MB':>9}{'acc':>8}{'agree':>8}{'p50 ms':>9}{'img/s':>9}")
+for name, row in report.items():
+    print(
+        f"{name:<14}{row['model_size_mb']:>9}{row['accuracy']:>8}"
+        f"{row['agreement_with_reference']:>8}{row['latency_ms_batch1_p50']:>9}"
+        f"{row[f'images_per_sec_batch{THROUGHPUT_BATCH}']:>9}"
+    )
+
+print(f"\n📁 Report saved: {REPORT_PATH}")
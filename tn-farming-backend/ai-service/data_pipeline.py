@@ -0,0 +1,234 @@
+import json
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+
+from dataset_shards import INDEX_FILE, SHARDS_DIR, ShardedSplit, ShardsError
+from dataset_utils import list_dataset
+
+
+# ==============================
+# CONFIG
+# ==============================
+# tf.data replacement for ImageDataGenerator.flow_from_directory: JPEG decode
+# and resize run in parallel inside the TF runtime, decoded images are cached
+# after the first epoch, augmentation runs on whole batches in-graph, and the
+# next batch is prepared while the current one trains.
+#
+# Augmentation matches the original generator: rotation ±20°, independent
+# x/y zoom of ±20%, horizontal flip, "nearest" fill.
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+IMG_SIZE = 224
+BATCH_SIZE = 32
+
+ROTATION_DEGREES = 20
+ZOOM_RANGE = 0.2
+
+PIXEL_SCALE = 1.0 / 255.0
+
+
+# ==============================
+# DECODE
+# ==============================
+
+def decode_and_resize(path, img_size=IMG_SIZE):
+    """File path -> (img_size, img_size, 3) uint8, kept as uint8 so cache() holds 1/4 the bytes"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+
+    # Bilinear, like the serving path (preprocessing.decode_image); the old
+    # generator used nearest-neighbour
+    image = tf.image.resize(image, (img_size, img_size), method="bilinear")
+    return tf.saturate_cast(tf.round(image), tf.uint8)
+
+
+# ==============================
+# AUGMENTATION
+# ==============================
+
+def make_augmenter(seed=None):
+    """Batch-level random rotation / zoom / flip, run on-graph"""
+    return tf.keras.Sequential([
+        layers.RandomRotation(ROTATION_DEGREES / 360, fill_mode="nearest", seed=seed),
+        layers.RandomZoom(
+            height_factor=(-ZOOM_RANGE, ZOOM_RANGE),
+            width_factor=(-ZOOM_RANGE, ZOOM_RANGE),
+            fill_mode="nearest",
+            seed=seed
+        ),
+        layers.RandomFlip("horizontal", seed=seed),
+    ], name="augment")
+
+
+# ==============================
+# DATASETS
+# ==============================
+
+def make_dataset(root, img_size=IMG_SIZE, batch_size=BATCH_SIZE, training=False, cache=True, seed=None):
+    """(dataset of (float32 [0, 1] images, one-hot labels), class_names) for a class-per-folder root
+
+    cache: True keeps decoded images in memory (~150 KB each at 224 px), a
+    path caches them to files there, False re-decodes every epoch.
+    """
+    paths, labels, class_names = list_dataset(root)
+    num_classes = len(class_names)
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(
+        lambda path, label: (decode_and_resize(path, img_size), label),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training
+    )
+
+    if cache:
+        ds = ds.cache(cache if isinstance(cache, str) else "")
+
+    if training:
+        # Cached elements are shuffled by reference, so a full-dataset buffer
+        # gives flow_from_directory's per-epoch permutation without copying images
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    ds = ds.batch(batch_size, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    return finish_batches(ds, num_classes, training=training, seed=seed), class_names
+
+
+def make_shard_dataset(root=SHARDS_DIR, split="train", img_size=IMG_SIZE, batch_size=BATCH_SIZE,
+                       training=False, seed=None):
+    """make_dataset over pre-decoded shards (dataset_shards.py): no decode, no cache needed
+
+    Shards stored larger than img_size are randomly cropped for training and
+    centre-cropped otherwise.
+    """
+    data = ShardedSplit(root, split)
+    rng = np.random.default_rng(seed)
+    stored = data.image_size
+
+    if stored < img_size:
+        raise ShardsError(f"Shards in {root} are {stored} px, smaller than the {img_size} px model input")
+
+    ds = tf.data.Dataset.from_generator(
+        lambda: data.batches(batch_size, shuffle=training, rng=rng),
+        output_signature=(
+            tf.TensorSpec((None, stored, stored, 3), tf.uint8),
+            tf.TensorSpec((None,), tf.int32)
+        )
+    )
+
+    crop = None
+    if stored != img_size:
+        crop = layers.RandomCrop(img_size, img_size, seed=seed) if training else layers.CenterCrop(img_size, img_size)
+
+    return finish_batches(ds, len(data.class_names), crop, training, seed), data.class_names
+
+
+def finish_batches(ds, num_classes, crop=None, training=False, seed=None):
+    """uint8 image batches -> cropped, augmented, [0, 1] float32 with one-hot labels, prefetched"""
+    augmenter = make_augmenter(seed) if training else None
+
+    def finish(images, batch_labels):
+        images = tf.cast(images, tf.float32)
+        if crop is not None:
+            images = crop(images, training=training)
+        if augmenter is not None:
+            images = augmenter(images, training=True)
+        return images * PIXEL_SCALE, tf.one_hot(batch_labels, num_classes)
+
+    ds = ds.map(finish, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    return ds.prefetch(AUTOTUNE)
+
+
+# ==============================
+# EPOCH TIMING
+# ==============================
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Wall time, training images/sec and Keras metrics per epoch (validation included in the time)
+
+    With log_path every epoch is also appended there as one JSON line, so an
+    interrupted run still leaves its timings behind.
+    """
+
+    def __init__(self, train_images, stage=None, log_path=None):
+        super().__init__()
+        self.train_images = train_images
+        self.stage = stage
+        self.log_path = log_path
+        self.epochs = []
+        self._started = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        entry = {
+            "epoch": epoch + 1,
+            "seconds": round(seconds, 2),
+            "images_per_sec": round(self.train_images / seconds, 1),
+            **{key: round(float(value), 5) for key, value in (logs or {}).items()}
+        }
+        if self.stage is not None:
+            entry = {"stage": self.stage, **entry}
+        self.epochs.append(entry)
+
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        print(f"⏱️  Epoch {epoch + 1}: {seconds:.1f}s ({self.train_images / seconds:.0f} img/s)")
+
+    def steady_images_per_sec(self):
+        """Mean images/sec over the epochs after the first (which pays for tracing and cache fill)"""
+        timed = self.epochs[1:] or self.epochs
+        if not timed:
+            return None
+        return round(sum(e["images_per_sec"] for e in timed) / len(timed), 1)
+
+
+# ==============================
+# BENCHMARK
+# ==============================
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    TRAIN_PATH = sys.argv[1] if len(sys.argv) > 1 else "dataset/train"
+
+    print("🌿 Training input pipeline benchmark (one full epoch, no model)\n")
+
+    def time_epoch(batches, steps):
+        started = time.perf_counter()
+        images = 0
+        for step, (x, _) in enumerate(batches):
+            images += len(x)
+            if step + 1 >= steps:
+                break
+        return time.perf_counter() - started, images
+
+    generator = ImageDataGenerator(
+        rescale=1./255,
+        rotation_range=ROTATION_DEGREES,
+        zoom_range=ZOOM_RANGE,
+        horizontal_flip=True
+    ).flow_from_directory(TRAIN_PATH, target_size=(IMG_SIZE, IMG_SIZE), batch_size=BATCH_SIZE)
+
+    seconds, images = time_epoch(generator, len(generator))
+    print(f"📦 {'ImageDataGenerator':<30}: {seconds:7.1f}s  {images / seconds:7.0f} img/s")
+
+    ds, _ = make_dataset(TRAIN_PATH, training=True)
+    steps = len(generator)
+
+    for label in ("tf.data epoch 1 (fills cache)", "tf.data epoch 2 (cached)"):
+        seconds, images = time_epoch(ds, steps)
+        print(f"⚡ {label:<30}: {seconds:7.1f}s  {images / seconds:7.0f} img/s")
+
+    if os.path.exists(os.path.join(SHARDS_DIR, INDEX_FILE)):
+        ds, _ = make_shard_dataset(SHARDS_DIR, "train", training=True)
+        seconds, images = time_epoch(ds, steps)
+        print(f"💾 {'shards (' + SHARDS_DIR + ')':<30}: {seconds:7.1f}s  {images / seconds:7.0f} img/s")
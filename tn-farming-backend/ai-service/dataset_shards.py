@@ -0,0 +1,285 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset_utils import list_dataset
+from preprocessing import decode_image
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Decode + resize the dataset once into uint8 .npy shards that training reads
+# back memory-mapped, so epochs cost a memcpy per image instead of a JPEG
+# decode. Images go through the serving decoder (preprocessing.decode_image),
+# so training sees the same pixels as /predict.
+#
+# dataset_shards/
+#   index.json                 <- class names, image size, shard list, source fingerprint
+#   train/
+#     images-00000.npy         (N, S, S, 3) uint8, SHARD_SIZE images each
+#     labels.npy               (total,) int16, in shard order
+#   val/
+#     ...
+#
+# python dataset_shards.py build                    (224 px, skipped if up to date)
+# python dataset_shards.py build --size 256 --force (crop to 224 at train time)
+# python dataset_shards.py info
+
+SOURCE_DIR = "dataset"
+SHARDS_DIR = os.environ.get("DATASET_SHARDS", "dataset_shards")
+SPLITS = ("train", "val")
+
+IMAGE_SIZE = 224
+SHARD_SIZE = 4096
+
+INDEX_FILE = "index.json"
+LABELS_FILE = "labels.npy"
+
+
+class ShardsError(Exception):
+    """Shards missing, incomplete or built from a different dataset"""
+
+
+# ==============================
+# BUILD
+# ==============================
+
+def source_fingerprint(paths):
+    """sha256 over every source file's path, size and mtime"""
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _decode_file(path, size):
+    with open(path, "rb") as f:
+        return decode_image(f.read(), (size, size))
+
+
+def _decode_many(paths, size):
+    return [_decode_file(path, size) for path in paths]
+
+
+def build_split(source, out_dir, size=IMAGE_SIZE, shard_size=SHARD_SIZE, workers=None):
+    """Decode one class-per-folder split into shards; returns its index entry"""
+    paths, labels, class_names = list_dataset(source)
+    if not paths:
+        raise ShardsError(f"No images found in {source}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(paths), shard_size):
+            shard_paths = paths[start:start + shard_size]
+            filename = f"images-{len(shards):05d}.npy"
+            images = np.lib.format.open_memmap(
+                os.path.join(out_dir, filename), mode="w+", dtype=np.uint8,
+                shape=(len(shard_paths), size, size, 3)
+            )
+
+            # Chunks of 64 keep the pickling overhead per image negligible
+            chunks = [shard_paths[i:i + 64] for i in range(0, len(shard_paths), 64)]
+            row = 0
+            for decoded in pool.map(_decode_many, chunks, [size] * len(chunks)):
+                for pixels in decoded:
+                    images[row] = pixels
+                    row += 1
+
+            images.flush()
+            del images
+            shards.append({"file": filename, "count": len(shard_paths)})
+            print(f"   {os.path.basename(out_dir)}: {start + len(shard_paths)}/{len(paths)} images")
+
+    np.save(os.path.join(out_dir, LABELS_FILE), np.asarray(labels, dtype=np.int16))
+
+    return {
+        "count": len(paths),
+        "shards": shards,
+        "class_names": class_names,
+        "fingerprint": source_fingerprint(paths),
+        "files": [os.path.relpath(p, source) for p in paths]
+    }
+
+
+def build(source=SOURCE_DIR, out=SHARDS_DIR, size=IMAGE_SIZE, shard_size=SHARD_SIZE, workers=None, force=False):
+    """Build every split; a no-op if the shards already match the source files"""
+    if not force and is_up_to_date(source, out, size):
+        print(f"✅ {out} is up to date")
+        return read_index(out)
+
+    # Built next to the old shards and swapped in once complete, so a failed
+    # or interrupted build never leaves a half-written index behind
+    tmp_out = out.rstrip("/") + ".building"
+    shutil.rmtree(tmp_out, ignore_errors=True)
+
+    started = time.perf_counter()
+    splits = {}
+    for split in SPLITS:
+        print(f"🔨 Decoding {os.path.join(source, split)} at {size}x{size}...")
+        splits[split] = build_split(os.path.join(source, split), os.path.join(tmp_out, split), size, shard_size, workers)
+
+    class_names = splits[SPLITS[0]].pop("class_names")
+    for split in SPLITS[1:]:
+        if splits[split].pop("class_names") != class_names:
+            raise ShardsError(f"{split} has different class folders than {SPLITS[0]}")
+
+    index = {
+        "created": time.time(),
+        "source": os.path.abspath(source),
+        "image_size": size,
+        "class_names": class_names,
+        "splits": splits
+    }
+
+    # Index last: shards only become loadable once every file is in place
+    with open(os.path.join(tmp_out, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp_out, out)
+
+    print(f"✅ Built {out} in {time.perf_counter() - started:.0f}s")
+    return index
+
+
+# ==============================
+# LOAD
+# ==============================
+
+def read_index(root=SHARDS_DIR):
+    path = os.path.join(root, INDEX_FILE)
+    if not os.path.exists(path):
+        raise ShardsError(f"No dataset shards in {root}, run: python dataset_shards.py build")
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def is_up_to_date(source=SOURCE_DIR, root=SHARDS_DIR, size=IMAGE_SIZE):
+    """True if the shards were built at `size` from exactly the current source files"""
+    try:
+        index = read_index(root)
+    except ShardsError:
+        return False
+
+    if index["image_size"] != size:
+        return False
+
+    for split in SPLITS:
+        if split not in index["splits"]:
+            return False
+        paths, _, _ = list_dataset(os.path.join(source, split))
+        if source_fingerprint(paths) != index["splits"][split]["fingerprint"]:
+            return False
+
+    return True
+
+
+def check_source(split_source, root=SHARDS_DIR, split="train"):
+    """Raise ShardsError unless `split` was built from exactly the files in `split_source`"""
+    index = read_index(root)
+    if split not in index["splits"]:
+        raise ShardsError(f"Split '{split}' is not in {root}")
+
+    paths, _, _ = list_dataset(split_source)
+    if source_fingerprint(paths) != index["splits"][split]["fingerprint"]:
+        raise ShardsError(
+            f"{root}/{split} is stale or was built from another dataset than {split_source}, "
+            f"run: python dataset_shards.py build"
+        )
+
+
+class ShardedSplit:
+    """One split's shards, memory-mapped; images are paged in only when gathered"""
+
+    def __init__(self, root=SHARDS_DIR, split="train"):
+        index = read_index(root)
+        if split not in index["splits"]:
+            raise ShardsError(f"Split '{split}' is not in {root}")
+
+        info = index["splits"][split]
+        split_dir = os.path.join(root, split)
+
+        self.class_names = index["class_names"]
+        self.image_size = index["image_size"]
+        self.shards = [np.load(os.path.join(split_dir, s["file"]), mmap_mode="r") for s in info["shards"]]
+        self.offsets = np.cumsum([0] + [len(s) for s in self.shards])
+        self.labels = np.load(os.path.join(split_dir, LABELS_FILE)).astype(np.int32)
+
+        if self.offsets[-1] != len(self.labels):
+            raise ShardsError(f"{split}: {self.offsets[-1]} images but {len(self.labels)} labels")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def gather(self, indices):
+        """(len(indices), S, S, 3) uint8 copy of the given images, read shard by shard"""
+        indices = np.asarray(indices)
+        out = np.empty((len(indices), self.image_size, self.image_size, 3), dtype=np.uint8)
+        shard_of = np.searchsorted(self.offsets, indices, side="right") - 1
+
+        for shard in np.unique(shard_of):
+            positions = np.flatnonzero(shard_of == shard)
+            local = indices[positions] - self.offsets[shard]
+
+            # Ascending reads turn random access into mostly sequential page-ins
+            order = np.argsort(local)
+            out[positions[order]] = self.shards[shard][local[order]]
+
+        return out
+
+    def batches(self, batch_size, shuffle=False, rng=None):
+        """(images, labels) batches over one epoch, in a fresh random order if shuffle"""
+        order = (rng or np.random.default_rng()).permutation(len(self)) if shuffle else np.arange(len(self))
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            yield self.gather(indices), self.labels[indices]
+
+
+# ==============================
+# CLI
+# ==============================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-decoded dataset shards for training")
+    sub = parser.add_subparsers(dest="command")
+
+    build_parser = sub.add_parser("build", help="decode dataset/ into shards (skipped if up to date)")
+    build_parser.add_argument("--source", default=SOURCE_DIR)
+    build_parser.add_argument("--out", default=SHARDS_DIR)
+    build_parser.add_argument("--size", type=int, default=IMAGE_SIZE,
+                              help="stored size; larger than the model input means random crops at train time")
+    build_parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    build_parser.add_argument("--workers", type=int, default=None)
+    build_parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+
+    info_parser = sub.add_parser("info", help="show what is in the shards")
+    info_parser.add_argument("--out", default=SHARDS_DIR)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "build":
+        build(args.source, args.out, args.size, args.shard_size, args.workers, args.force)
+
+    else:
+        out = getattr(args, "out", SHARDS_DIR)
+        index = read_index(out)
+        print(f"📁 {out}: {len(index['class_names'])} classes at {index['image_size']}x{index['image_size']}")
+        for split, info in index["splits"].items():
+            nbytes = info["count"] * index["image_size"] ** 2 * 3
+            print(f"   {split}: {info['count']} images in {len(info['shards'])} shards ({nbytes / 1e9:.2f} GB)")
@@ -0,0 +1,64 @@
+import os
+import random
+
+import numpy as np
+
+from preprocessing import decode_image, to_model_input
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# ==============================
+# DATASET LISTING
+# ==============================
+
+def list_dataset(root):
+    """Return (paths, labels, class_names) for a class-per-folder dataset"""
+    class_names = sorted(
+        d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))
+    )
+
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(root, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, filename))
+                labels.append(label)
+
+    return paths, labels, class_names
+
+
+def sample_dataset(root, per_class, seed=42):
+    """Pick up to `per_class` images from every class, reproducibly"""
+    paths, labels, class_names = list_dataset(root)
+
+    by_class = {}
+    for path, label in zip(paths, labels):
+        by_class.setdefault(label, []).append(path)
+
+    rng = random.Random(seed)
+    sampled_paths, sampled_labels = [], []
+    for label in sorted(by_class):
+        chosen = by_class[label]
+        if len(chosen) > per_class:
+            chosen = rng.sample(chosen, per_class)
+        sampled_paths.extend(chosen)
+        sampled_labels.extend([label] * len(chosen))
+
+    return sampled_paths, sampled_labels, class_names
+
+
+# ==============================
+# IMAGE LOADING
+# ==============================
+
+def load_image(path, img_size=224):
+    """Same preprocessing as the serving path: fast decode, resize, scale to [0, 1]"""
+    with open(path, "rb") as f:
+        return to_model_input(decode_image(f.read(), (img_size, img_size)))
+
+
+def load_images(paths, img_size=224):
+    return np.stack([load_image(p, img_size) for p in paths])
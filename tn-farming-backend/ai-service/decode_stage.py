@@ -0,0 +1,190 @@
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import metrics
+from tracing import record_stage, traced_call
+
+
+# ==============================
+# DECODE STAGE
+# ==============================
+
+class DecodeQueueFull(Exception):
+    """Raised when too many uploads are already waiting to be decoded"""
+
+
+class DecodeStage:
+    """Bounded decode pool feeding the single micro-batching inference worker
+
+    Pillow releases the GIL while decoding, so a thread pool lets decode of
+    request N+1 overlap inference of request N. A process pool can be used
+    instead on hosts where decode still contends with the request threads.
+    """
+
+    def __init__(self, decode_fn, batcher, workers=4, max_pending=16, use_processes=False,
+                 near_duplicates=None):
+        self.decode_fn = decode_fn
+        self.batcher = batcher
+        self.near_duplicates = near_duplicates
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.use_processes = use_processes
+
+        if use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decode")
+
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def pending(self):
+        return self._pending
+
+    # ------------------------------
+    # BACKPRESSURE
+    # ------------------------------
+
+    def _acquire(self, timeout, trace=None):
+        started = time.perf_counter()
+        admitted = self._slots.acquire(timeout=timeout)
+        record_stage("admission", time.perf_counter() - started, trace)
+
+        if not admitted:
+            raise DecodeQueueFull(f"{self.max_pending} uploads already waiting for decode")
+        with self._pending_lock:
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    # ------------------------------
+    # SUBMIT
+    # ------------------------------
+
+    def submit_decode(self, image_bytes, timeout=None, trace=None):
+        """Future for the decoded (1, H, W, 3) uint8 array"""
+        self._acquire(timeout, trace)
+        submitted = time.perf_counter()
+
+        decode_fn = self.decode_fn
+        if trace is not None:
+            # cProfile objects can't come back from a child process
+            decode_fn = partial(traced_call, self.decode_fn, profile=trace.profile and not self.use_processes)
+
+        try:
+            future = self._executor.submit(decode_fn, image_bytes)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        # Includes time waiting for a free pool worker
+        future.add_done_callback(lambda f: record_stage("decode", time.perf_counter() - submitted, trace))
+
+        if trace is None:
+            return future
+        return _unpack_traced(future, trace)
+
+    def submit_predict(self, image_bytes, timeout=None, trace=None):
+        """Future for (prediction row, formatted row): decode here, then hand off to the batcher
+
+        The row is formatted by the batcher along with the rest of its batch.
+        With a near-duplicate index, an upload that looks like a recent one
+        reuses that prediction row instead of running the model, and comes
+        back as (row, None) for the caller to format.
+        """
+        result = Future()
+
+        def forward(decoded):
+            error = decoded.exception()
+            if error is not None:
+                metrics.count_error("decode", error)
+                result.set_exception(error)
+                return
+
+            self._forward(decoded.result(), result, trace)
+
+        self.submit_decode(image_bytes, timeout, trace).add_done_callback(forward)
+        return result
+
+    def submit_pixels(self, pixels, timeout=None, trace=None):
+        """submit_predict for an already decoded (1, H, W, 3) uint8 upload
+
+        Takes a decode slot like any other upload and holds it until the row
+        is back: with no decode to wait on, this is what stops a burst of
+        tensor uploads from queueing in front of the batcher without limit.
+        """
+        self._acquire(timeout, trace)
+        result = Future()
+        result.add_done_callback(self._release)
+
+        try:
+            self._forward(pixels, result, trace)
+        except Exception as e:
+            result.set_exception(e)
+            raise
+        return result
+
+    def _forward(self, pixels, result, trace):
+        on_row = None
+
+        if self.near_duplicates is not None:
+            try:
+                started = time.perf_counter()
+                phash, row = self.near_duplicates.lookup(pixels[0])
+                record_stage("near_duplicate", time.perf_counter() - started, trace)
+            except Exception as e:
+                result.set_exception(e)
+                return
+
+            if row is not None:
+                if trace is not None:
+                    trace.note("near_duplicate", True)
+                result.set_result((row, None))
+                return
+
+            on_row = lambda r: self.near_duplicates.add(phash, r)
+
+        inference = self.batcher.submit(pixels, trace, formatted=True)
+        inference.add_done_callback(lambda f: _copy_row(f, result, on_row))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def _unpack_traced(future, trace):
+    """Future for the pixels of a traced_call, moving its timings onto the trace"""
+    result = Future()
+
+    def unpack(done):
+        error = done.exception()
+        if error is not None:
+            result.set_exception(error)
+            return
+
+        pixels, wall, cpu, profiler = done.result()
+        trace.add("decode_run", wall)
+        trace.add("decode_cpu", cpu)
+        if profiler is not None:
+            trace.add_profile(profiler)
+        result.set_result(pixels)
+
+    future.add_done_callback(unpack)
+    return result
+
+
+def _copy_row(source, target, on_row=None):
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+        return
+
+    rows, formatted = source.result()
+    if on_row is not None:
+        on_row(rows[0])
+    target.set_result((rows[0], formatted[0] if formatted is not None else None))
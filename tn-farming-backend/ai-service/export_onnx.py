@@ -0,0 +1,54 @@
+import tensorflow as tf
+import tf2onnx
+import numpy as np
+import os
+
+from dataset_utils import load_images, sample_dataset
+from inference_backends import KERAS_MODEL_PATH, ONNX_MODEL_PATH
+
+print("🌿 Exporting ONNX model...\n")
+
+# ==============================
+# CONFIG
+# ==============================
+
+VAL_PATH = "dataset/val"
+OPSET = 13
+
+# Images used to check the exported graph against Keras
+CHECK_PER_CLASS = 2
+
+# ==============================
+# CONVERT
+# ==============================
+
+model = tf.keras.models.load_model(KERAS_MODEL_PATH)
+
+print("📊 Input shape:", model.input_shape)
+print("📊 Output shape:", model.output_shape)
+
+# Dynamic batch dimension so the micro-batcher can send any batch size
+spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="images"),)
+
+tf2onnx.convert.from_keras(model, input_signature=spec, opset=OPSET, output_path=ONNX_MODEL_PATH)
+
+print(f"✅ ONNX model saved: {ONNX_MODEL_PATH} ({os.path.getsize(ONNX_MODEL_PATH) / 1e6:.1f} MB)")
+
+# ==============================
+# VERIFY AGAINST KERAS
+# ==============================
+
+import onnxruntime as ort
+
+paths, _, _ = sample_dataset(VAL_PATH, CHECK_PER_CLASS)
+images = load_images(paths, model.input_shape[1])
+
+session = ort.InferenceSession(ONNX_MODEL_PATH, providers=["CPUExecutionProvider"])
+onnx_out = session.run(None, {session.get_inputs()[0].name: images})[0]
+keras_out = model(images, training=False).numpy()
+
+max_diff = float(np.abs(onnx_out - keras_out).max())
+agreement = float((onnx_out.argmax(1) == keras_out.argmax(1)).mean())
+
+print(f"🔍 Checked {len(images)} images: max |Δp| = {max_diff:.2e}, top-1 agreement = {agreement:.2%}")
+print("\n🚀 Serve it with: MODEL_BACKEND=onnx python app.py")
@@ -0,0 +1,74 @@
+import tensorflow as tf
+import os
+
+from dataset_utils import load_image, sample_dataset
+from inference_backends import KERAS_MODEL_PATH, TFLITE_FP16_PATH, TFLITE_INT8_PATH
+
+print("🌿 Exporting TFLite models...\n")
+
+# ==============================
+# CONFIG
+# ==============================
+
+VAL_PATH = "dataset/val"
+
+# Calibration images per class for full-int8 quantization
+REPRESENTATIVE_PER_CLASS = 20
+
+# ==============================
+# LOAD KERAS MODEL
+# ==============================
+
+model = tf.keras.models.load_model(KERAS_MODEL_PATH)
+img_size = model.input_shape[1]
+
+print("📊 Input shape:", model.input_shape)
+print("📊 Output shape:", model.output_shape)
+
+# ==============================
+# FLOAT16
+# ==============================
+
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.target_spec.supported_types = [tf.float16]
+
+with open(TFLITE_FP16_PATH, "wb") as f:
+    f.write(converter.convert())
+
+print(f"✅ float16 model saved: {TFLITE_FP16_PATH}")
+
+# ==============================
+# FULL INT8
+# ==============================
+
+rep_paths, _, _ = sample_dataset(VAL_PATH, REPRESENTATIVE_PER_CLASS)
+
+print(f"📁 Calibrating int8 with {len(rep_paths)} images from {VAL_PATH}")
+
+
+def representative_dataset():
+    for path in rep_paths:
+        yield [load_image(path, img_size)[None, ...]]
+
+
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.representative_dataset = representative_dataset
+converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+# Input is quantized from [0, 1] floats by the backend; output stays float32
+converter.inference_input_type = tf.uint8
+
+with open(TFLITE_INT8_PATH, "wb") as f:
+    f.write(converter.convert())
+
+print(f"✅ int8 model saved: {TFLITE_INT8_PATH}")
+
+# ==============================
+# SUMMARY
+# ==============================
+
+for path in (KERAS_MODEL_PATH, TFLITE_FP16_PATH, TFLITE_INT8_PATH):
+    print(f"📦 {path}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+print("\n🚀 Now run: python compare_backends.py")
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from data_pipeline import make_augmenter
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Stage 1 trains only the head while the backbone is frozen, so the backbone's
+# pooled output for an image never changes. Run it once per image (plus
+# FEATURE_AUGMENT_COPIES fixed augmented copies), keep the (N, 1280) vectors
+# on disk, and stage 1 becomes a small MLP fit that takes seconds.
+#
+# Files are keyed by the backbone, image size, copies and a fingerprint of
+# the source images, so a changed dataset or setting is re-extracted.
+
+FEATURE_CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", "feature_cache")
+FEATURE_AUGMENT_COPIES = int(os.environ.get("FEATURE_AUGMENT_COPIES", 0))
+
+
+# ==============================
+# EXTRACTION
+# ==============================
+
+def extract_features(backbone, ds, copies=0, seed=None):
+    """(features (N * (1 + copies), D) float32, labels) for an unshuffled (images, one-hot) dataset
+
+    Copy 0 is the images as given; each further copy is a fresh random
+    augmentation of the same images, fixed once it is cached.
+    """
+    pool = tf.keras.layers.GlobalAveragePooling2D()
+    augmenter = make_augmenter(seed) if copies else None
+
+    @tf.function(reduce_retracing=True)
+    def embed(images):
+        return pool(backbone(images, training=False))
+
+    features, labels = [], []
+    for copy in range(1 + copies):
+        started = time.perf_counter()
+        count = 0
+
+        for images, one_hot in ds:
+            if copy:
+                images = augmenter(images, training=True)
+            features.append(embed(images).numpy())
+            labels.append(np.argmax(one_hot, axis=1))
+            count += len(images)
+
+        print(f"   copy {copy}: {count} images in {time.perf_counter() - started:.0f}s")
+
+    return np.concatenate(features).astype(np.float32), np.concatenate(labels).astype(np.int32)
+
+
+def cache_path(name, key_parts, cache_dir=FEATURE_CACHE_DIR):
+    key = hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{name}-{key}.npz")
+
+
+def cached_features(name, backbone, ds, key_parts, copies=0, seed=None, cache_dir=FEATURE_CACHE_DIR):
+    """extract_features, loaded from <cache_dir>/<name>-<key>.npz when already extracted"""
+    key = dict(key_parts, copies=copies, backbone=backbone.name)
+    # Augmented copies depend on the seed; copy 0 alone does not
+    if copies:
+        key["seed"] = seed
+    path = cache_path(name, key, cache_dir)
+
+    if os.path.exists(path):
+        with np.load(path) as data:
+            print(f"💾 Cached {name} features: {path}")
+            return data["features"], data["labels"]
+
+    print(f"🧮 Extracting {name} features ({1 + copies} pass{'es' if copies else ''} over the backbone)...")
+    features, labels = extract_features(backbone, ds, copies, seed)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, features=features, labels=labels)
+    os.replace(tmp_path, path)
+
+    return features, labels
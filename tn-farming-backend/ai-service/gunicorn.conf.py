@@ -0,0 +1,81 @@
+import gc
+import os
+
+
+# ==============================
+# GUNICORN SERVING CONFIG
+# ==============================
+# Run with:  gunicorn -c gunicorn.conf.py wsgi:application
+# See SERVING.md for the trade-offs between the two loading modes.
+
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+
+workers = int(os.environ.get("WEB_WORKERS", 2))
+
+# Threads per worker keep several requests in flight so the micro-batcher
+# has something to batch; inference itself is still one worker thread
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 8))
+
+# PRELOAD_MODEL=1: load once in the master before fork (best for onnx/tflite).
+# PRELOAD_MODEL=0: load per worker — required for the keras backend, since the
+# TensorFlow runtime's thread pools do not survive fork().
+preload_app = os.environ.get("PRELOAD_MODEL", "0") == "1"
+
+# A background loader thread would not survive fork, so preload always blocks
+if preload_app:
+    os.environ["MODEL_LOAD_MODE"] = "blocking"
+
+# Graceful restarts (SIGHUP / rolling deploys): workers stop accepting new
+# connections and get this long to finish in-flight predictions
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+keepalive = 5
+
+# Recycle workers occasionally to bound slow memory growth
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# Pin backend thread pools so N workers don't oversubscribe the cores
+_cpus = os.cpu_count() or 1
+_per_worker = str(max(1, _cpus // workers))
+os.environ.setdefault("INTRA_OP_THREADS", _per_worker)
+os.environ.setdefault("INTER_OP_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", _per_worker)
+os.environ.setdefault("DECODE_WORKERS", _per_worker)
+
+# /metrics on any worker reports the sum over all workers of this master
+os.environ.setdefault("METRICS_DIR", f"/tmp/ai-service-metrics-{os.getpid()}")
+
+
+def when_ready(server):
+    server.log.info(
+        f"🚀 {workers} workers x {threads} threads, preload={preload_app}, "
+        f"intra_op={os.environ['INTRA_OP_THREADS']}"
+    )
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far (model weights included) out of the
+    # GC's reach so collections in workers don't dirty shared CoW pages
+    if preload_app:
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Hot reload per worker: pkill -USR2 -P <master pid>. Never in the master,
+    # where USR2 means "upgrade the gunicorn binary".
+    import inference_service as service
+    import metrics
+
+    service.install_reload_signal()
+    metrics.start_flusher()
+
+
+def worker_exit(server, worker):
+    # In-flight requests have finished by now; let queued decodes drain
+    import inference_service as service
+    import metrics
+
+    service.shutdown()
+    metrics.flush()
@@ -0,0 +1,224 @@
+import threading
+
+import numpy as np
+
+
+# ==============================
+# CONFIG
+# ==============================
+
+KERAS_MODEL_PATH = "models/plant_disease_model.keras"
+TFLITE_FP16_PATH = "models/plant_disease_model_fp16.tflite"
+TFLITE_INT8_PATH = "models/plant_disease_model_int8.tflite"
+ONNX_MODEL_PATH = "models/plant_disease_model.onnx"
+
+MODEL_BACKENDS = {
+    "keras": KERAS_MODEL_PATH,
+    "tflite-fp16": TFLITE_FP16_PATH,
+    "tflite-int8": TFLITE_INT8_PATH,
+    "onnx": ONNX_MODEL_PATH,
+}
+
+# Batch sizes the tflite backend keeps an interpreter for, so a micro-batch
+# never resizes one. Each interpreter holds its own XNNPACK-packed copy of
+# the weights, so every bucket costs about one model's memory per worker.
+TFLITE_BATCH_BUCKETS = [1, 8, 32]
+
+
+# ==============================
+# KERAS (traced tf.function)
+# ==============================
+
+class KerasBackend:
+    """Full Keras model served through a traced tf.function"""
+
+    name = "keras"
+
+    def __init__(self, model_path=KERAS_MODEL_PATH, intra_op_threads=None, inter_op_threads=None):
+        import tensorflow as tf
+
+        # Only takes effect before the TF runtime initializes (first load in the process)
+        try:
+            if intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            if inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError as e:
+            print("⚠️  TensorFlow thread settings ignored:", e)
+
+        self._tf = tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape)
+        self.output_shape = tuple(self.model.output_shape)
+
+        spec = tf.TensorSpec(shape=(None,) + self.input_shape[1:], dtype=tf.float32)
+        keras_model = self.model
+
+        @tf.function(input_signature=[spec])
+        def serve(images):
+            return keras_model(images, training=False)
+
+        self._serve = serve
+
+    def predict(self, batch):
+        images = self._tf.convert_to_tensor(batch, dtype=self._tf.float32)
+        return self._serve(images).numpy()
+
+
+# ==============================
+# TFLITE (fp16 / int8)
+# ==============================
+
+def _tflite_interpreter_class():
+    # tflite-runtime is much lighter than TensorFlow on the small VMs
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """TFLite interpreters, one per batch-size bucket
+
+    Each batch is zero-padded up to the smallest bucket that holds it and
+    runs on that bucket's interpreter, allocated once. Resizing a single
+    interpreter to every micro-batch size would re-run allocate_tensors()
+    (and XNNPACK's prepare) on almost every call. Batches larger than the
+    largest bucket run through it in chunks.
+    """
+
+    def __init__(self, model_path, name="tflite", num_threads=None, batch_buckets=TFLITE_BATCH_BUCKETS):
+        self._Interpreter = _tflite_interpreter_class()
+
+        self.name = name
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.batch_buckets = sorted(set(int(b) for b in batch_buckets))
+        self._interpreters = {}
+        self._lock = threading.Lock()
+
+        interpreter = self._Interpreter(model_path=model_path, num_threads=num_threads)
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+
+        self.input_shape = (None,) + tuple(int(d) for d in input_details["shape"][1:])
+        self.output_shape = (None,) + tuple(int(d) for d in output_details["shape"][1:])
+
+    def _interpreter_for(self, bucket):
+        """(interpreter, input details, output details) allocated for `bucket` rows"""
+        if bucket not in self._interpreters:
+            interpreter = self._Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, [bucket] + list(self.input_shape[1:]))
+            interpreter.allocate_tensors()
+
+            # Quantization params are read after allocation
+            self._interpreters[bucket] = (
+                interpreter,
+                interpreter.get_input_details()[0],
+                interpreter.get_output_details()[0],
+            )
+        return self._interpreters[bucket]
+
+    def predict(self, batch):
+        with self._lock:
+            largest = self.batch_buckets[-1]
+            if len(batch) <= largest:
+                return self._predict_bucket(batch)
+
+            return np.concatenate([
+                self._predict_bucket(batch[start:start + largest])
+                for start in range(0, len(batch), largest)
+            ])
+
+    def _predict_bucket(self, batch):
+        rows = len(batch)
+        bucket = next(b for b in self.batch_buckets if b >= rows)
+        interpreter, input_details, output_details = self._interpreter_for(bucket)
+
+        if rows < bucket:
+            padded = np.zeros((bucket,) + batch.shape[1:], dtype=np.float32)
+            padded[:rows] = batch
+            batch = padded
+
+        input_dtype = input_details["dtype"]
+        if np.issubdtype(input_dtype, np.integer):
+            scale, zero_point = input_details["quantization"]
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+
+        interpreter.set_tensor(input_details["index"], batch.astype(input_dtype, copy=False))
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details["index"])[:rows]
+
+        if np.issubdtype(output.dtype, np.integer):
+            scale, zero_point = output_details["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+
+        return output.copy()
+
+
+# ==============================
+# ONNX RUNTIME
+# ==============================
+
+class OnnxBackend:
+    """ONNX Runtime session — no TensorFlow import in the serving process"""
+
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, intra_op_threads=None, inter_op_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        # inter_op_num_threads is only used by the parallel executor
+        if inter_op_threads and inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+            options.inter_op_num_threads = inter_op_threads
+        else:
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.model_path = model_path
+        self._session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+        model_input = self._session.get_inputs()[0]
+        model_output = self._session.get_outputs()[0]
+        self._input_name = model_input.name
+
+        # Dynamic dims come back as strings/None — normalise the batch dim to None
+        self.input_shape = (None,) + tuple(model_input.shape[1:])
+        self.output_shape = (None,) + tuple(model_output.shape[1:])
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+# ==============================
+# FACTORY
+# ==============================
+
+def load_backend(name, intra_op_threads=None, inter_op_threads=None, path=None, batch_buckets=None):
+    """Load the inference backend selected by MODEL_BACKEND (optionally from another path)"""
+    if name not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}', expected one of {list(MODEL_BACKENDS)}")
+
+    path = path or MODEL_BACKENDS[name]
+
+    if name == "keras":
+        return KerasBackend(path, intra_op_threads, inter_op_threads)
+
+    if name == "onnx":
+        return OnnxBackend(path, intra_op_threads, inter_op_threads)
+
+    return TFLiteBackend(path, name=name, num_threads=intra_op_threads,
+                         batch_buckets=batch_buckets or TFLITE_BATCH_BUCKETS)
@@ -0,0 +1,727 @@
+import json
+import os
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+
+# ✅ IMPORT pesticide engine
+from pesticide_engine import calculate_pesticide
+import metrics
+from tracing import record_stage
+from batcher import MicroBatcher
+from inference_backends import MODEL_BACKENDS, TFLITE_BATCH_BUCKETS, load_backend
+from decode_stage import DecodeStage
+from preprocessing import decode_for_model
+from prediction_cache import cache_key, file_checksum, make_cache
+from near_duplicates import NearDuplicateIndex
+from model_registry import RegistryError, active_version, is_version_name, list_versions, read_manifest, resolve
+from postprocess import CALIBRATION_TEMPERATURE, Postprocessor
+from uploads import TENSOR_CONTENT_TYPE, UPLOAD_MAX_BYTES, UploadRejected
+
+
+# ==============================
+# CONFIG
+# ==============================
+
+CLASS_NAMES_PATH = "models/class_names.json"
+
+# blocking: load + warm up before serving (default)
+# background: bind the port at once, /health reports "loading" until ready
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "blocking")
+
+# Inference backend: keras | tflite-fp16 | tflite-int8 | onnx
+# (see export_tflite.py / export_onnx.py)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras")
+MODEL_PATH = MODEL_BACKENDS.get(MODEL_BACKEND, MODEL_BACKENDS["keras"])
+
+# Thread pools inside the backend; 0 = library default
+INTRA_OP_THREADS = int(os.environ.get("INTRA_OP_THREADS", 0)) or None
+INTER_OP_THREADS = int(os.environ.get("INTER_OP_THREADS", 0)) or None
+
+# Micro-batching: concurrent /predict calls are grouped into one forward pass
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 10))
+
+# /predict/batch: field officers upload a whole plot visit in one request
+BATCH_MAX_IMAGES = int(os.environ.get("BATCH_MAX_IMAGES", 64))
+
+# Decode stage: bounded pool in front of the single inference worker.
+# When DECODE_MAX_PENDING uploads are already queued, new ones wait up to
+# DECODE_ADMIT_TIMEOUT_MS and are then rejected with 503.
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", os.cpu_count() or 4))
+DECODE_MAX_PENDING = int(os.environ.get("DECODE_MAX_PENDING", DECODE_WORKERS * 4))
+DECODE_ADMIT_TIMEOUT_MS = float(os.environ.get("DECODE_ADMIT_TIMEOUT_MS", 500))
+DECODE_USE_PROCESSES = os.environ.get("DECODE_USE_PROCESSES", "0") == "1"
+
+# Prediction cache keyed on a hash of the raw upload + model version, so
+# retries of the same photo skip decode and inference: memory | sqlite | off.
+# The sqlite backend is one file shared by every worker on the host.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 4096))
+CACHE_TTL_S = float(os.environ.get("CACHE_TTL_S", 6 * 3600))
+CACHE_PATH = os.environ.get("CACHE_PATH", "cache/predictions.sqlite3")
+
+# Near-duplicate reuse: re-compressed / slightly cropped re-uploads whose dHash
+# is within PHASH_MAX_DISTANCE bits of a recent one skip the model (-1 = off).
+# Off by default: distinct leaf photos can hash that close, and a false match
+# returns another image's diagnosis. Tune it on real traffic with
+# replay_dedup.py first (largest distance with zero cross-class matches).
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", -1))
+PHASH_INDEX_SIZE = int(os.environ.get("PHASH_INDEX_SIZE", 8192))
+
+# Hot reload: POST /admin/reload (X-Admin-Token: ADMIN_TOKEN) or SIGUSR2 loads
+# a registry version in the background, warms it and swaps it in; the old
+# version is retired once the last request admitted on it has finished.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Client-side downscaling (GET /predict/config): the app resizes to the model
+# input and re-encodes at this JPEG quality before upload; 85 is visually
+# indistinguishable at 224 px and keeps a photo around 15-25 KB
+CLIENT_JPEG_QUALITY = int(os.environ.get("CLIENT_JPEG_QUALITY", 85))
+
+# tflite: batch sizes with their own allocated interpreter (each about one
+# model's memory). Larger batches run in chunks of the largest bucket, so
+# buckets above BATCH_MAX_SIZE are dropped.
+_buckets = os.environ.get("TFLITE_BATCH_BUCKETS", ",".join(map(str, TFLITE_BATCH_BUCKETS)))
+TFLITE_BATCH_BUCKETS = [b for b in map(int, _buckets.split(",")) if 0 < b <= BATCH_MAX_SIZE] or [BATCH_MAX_SIZE]
+
+# Batch sizes traced/warmed at startup so the first real requests don't pay for it
+WARMUP_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+active = None               # ModelBundle currently serving
+model_ready = False
+model_state = "not_loaded"  # not_loaded | loading | ready | failed
+model_load_seconds = None
+prediction_cache = None
+
+reload_status = {"in_progress": False, "last_version": None, "last_error": None, "finished_at": None}
+_reload_lock = threading.Lock()
+
+# Cache puts (a SQLite insert for the shared backend) run here, off the
+# micro-batcher thread whose future callbacks would otherwise pay for them
+_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-write")
+
+metrics.BATCH_QUEUE_DEPTH.fn = lambda: active.batcher.queue_depth() if active else 0
+metrics.DECODE_PENDING.fn = lambda: active.decode_stage.pending() if active else 0
+
+
+# ==============================
+# MODEL BUNDLE
+# ==============================
+
+class ModelBundle:
+    """One loaded model version and the pipeline bound to it, swapped as a unit"""
+
+    def __init__(self, version, model, class_names, temperature=CALIBRATION_TEMPERATURE):
+        self.version = version
+        self.model = model
+        self.class_names = class_names
+        self.postprocessor = Postprocessor(class_names, temperature=temperature)
+        self.cache_namespace = f"{MODEL_BACKEND}:{version}:{self.postprocessor.signature}"
+
+        self.batcher = None
+        self.decode_stage = None
+        self.near_duplicates = None
+
+        # Requests pinned to this bundle; a swapped-out bundle retires at zero
+        self._in_flight = 0
+        self._draining = False
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def run_inference(self, batch):
+        return self.model.predict(batch)
+
+    def warm_up(self):
+        input_shape = tuple(self.model.input_shape[1:])
+
+        # tflite: allocate each bucket's interpreter once, and no more of them
+        sizes = getattr(self.model, "batch_buckets", None)
+        if sizes is None:
+            sizes = [s for s in WARMUP_BATCH_SIZES if s <= max(BATCH_MAX_SIZE, BATCH_MAX_IMAGES)]
+
+        for size in sizes:
+            self.run_inference(np.zeros((size,) + input_shape, dtype=np.float32))
+
+        print(f"🔥 Warm-up done for batch sizes {sizes}")
+
+    def start(self):
+        self.batcher = MicroBatcher(
+            self.run_inference,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            format_fn=self.postprocessor.format_batch
+        )
+        # The worker thread starts on the first submit. Starting it here would
+        # park it in queue.get() in the gunicorn master under PRELOAD_MODEL=1,
+        # and each forked worker would inherit its waiter on the queue.
+
+        print(f"📦 Micro-batching: max {BATCH_MAX_SIZE} images / {BATCH_MAX_WAIT_MS} ms")
+
+        if PHASH_MAX_DISTANCE >= 0:
+            self.near_duplicates = NearDuplicateIndex(PHASH_MAX_DISTANCE, PHASH_INDEX_SIZE)
+
+        # PIL sizes are (width, height); the model's input shape is (height, width)
+        height, width = model_input_size(self)
+        self.decode_stage = DecodeStage(
+            partial(decode_for_model, size=(width, height)),
+            self.batcher,
+            workers=DECODE_WORKERS,
+            max_pending=DECODE_MAX_PENDING,
+            use_processes=DECODE_USE_PROCESSES,
+            near_duplicates=self.near_duplicates
+        )
+
+        pool_kind = "processes" if DECODE_USE_PROCESSES else "threads"
+        print(f"🧵 Decode stage: {DECODE_WORKERS} {pool_kind}, max {DECODE_MAX_PENDING} pending")
+
+    def hold(self):
+        """Count one more request in flight on this bundle (False once it is retired)"""
+        with self._lock:
+            if self._retired:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            idle = self._claim_retire()
+
+        # Often called from a decode or batcher thread, which can't shut down its own pool
+        if idle:
+            threading.Thread(target=self.retire, name="model-retire", daemon=True).start()
+
+    def retire_when_idle(self):
+        """Retire now if nothing is in flight, else when the last request releases"""
+        with self._lock:
+            self._draining = True
+            idle = self._claim_retire()
+
+        if idle:
+            self.retire()
+
+    def _claim_retire(self):
+        """True exactly once, when draining with nothing in flight (caller holds _lock)"""
+        if self._draining and self._in_flight == 0 and not self._retired:
+            self._retired = True
+            return True
+        return False
+
+    def retire(self):
+        """Let admitted decodes and queued batches finish, then stop the threads"""
+        with self._lock:
+            self._retired = True
+
+        if self.decode_stage is not None:
+            self.decode_stage.shutdown()
+        if self.batcher is not None:
+            self.batcher.stop()
+        print(f"🗑️  Retired model version {self.version}")
+
+
+# ==============================
+# LOAD MODEL
+# ==============================
+
+def locate_model(version=None):
+    """(version, model path, class_names path, calibration temperature)
+
+    From the registry when it has a version (temperature from its manifest if
+    one was fitted), else the legacy models/ files.
+    """
+    filename = os.path.basename(MODEL_PATH)
+    version = version or active_version()
+
+    if version:
+        model_path, class_names_path = resolve(version, filename)
+        temperature = read_manifest(version).get("temperature", CALIBRATION_TEMPERATURE)
+        return version, model_path, class_names_path, temperature
+
+    if not os.path.exists(MODEL_PATH):
+        raise RegistryError(f"Model file not found: {MODEL_PATH}")
+    if not os.path.exists(CLASS_NAMES_PATH):
+        raise RegistryError("class_names.json not found")
+
+    return f"legacy-{file_checksum(MODEL_PATH)[:12]}", MODEL_PATH, CLASS_NAMES_PATH, CALIBRATION_TEMPERATURE
+
+
+def build_bundle(version=None):
+    """Load, verify and warm one model version and start its pipeline (raises on failure)"""
+    if MODEL_BACKEND not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown MODEL_BACKEND '{MODEL_BACKEND}', expected one of {list(MODEL_BACKENDS)}")
+
+    version, model_path, class_names_path, temperature = locate_model(version)
+
+    with open(class_names_path, "r") as f:
+        class_names = json.load(f)
+
+    print(f"📁 Loaded {len(class_names)} class names")
+
+    print(f"🌿 Loading trained model {version} ({MODEL_BACKEND})...")
+    model = load_backend(
+        MODEL_BACKEND,
+        intra_op_threads=INTRA_OP_THREADS,
+        inter_op_threads=INTER_OP_THREADS,
+        path=model_path,
+        batch_buckets=TFLITE_BATCH_BUCKETS
+    )
+
+    print("✅ Model loaded successfully")
+    print("📊 Input shape:", model.input_shape)
+    print("📊 Output shape:", model.output_shape)
+
+    bundle = ModelBundle(version, model, class_names, temperature)
+    bundle.warm_up()
+    bundle.start()
+    return bundle
+
+
+def load_model():
+    """Load, warm up and start the pipeline; flips model_ready only once all of it is up"""
+    global active, prediction_cache, model_ready, model_state, model_load_seconds
+
+    model_state = "loading"
+    started = time.perf_counter()
+
+    try:
+        active = build_bundle()
+
+        prediction_cache = make_cache(CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_TTL_S, CACHE_PATH)
+        print(f"🗃️  Prediction cache: {CACHE_BACKEND}")
+
+        ok = True
+
+    except Exception as e:
+        print("❌ Model loading failed:", e)
+        traceback.print_exc()
+        ok = False
+
+    model_load_seconds = round(time.perf_counter() - started, 2)
+    model_state = "ready" if ok else "failed"
+    model_ready = ok
+
+    if ok:
+        print(f"⏱️  Model ready in {model_load_seconds}s")
+
+    return ok
+
+
+def start_background_load():
+    """Load the model on a daemon thread so the HTTP server can bind immediately"""
+    global model_state
+
+    model_state = "loading"
+    thread = threading.Thread(target=load_model, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown():
+    if active is not None:
+        active.retire()
+
+
+# ==============================
+# HOT RELOAD
+# ==============================
+
+def reload_model(version=None):
+    """Build `version` (default: registry ACTIVE) off to the side, then swap it in"""
+    global active
+
+    if not _reload_lock.acquire(blocking=False):
+        print("⚠️  Reload already in progress")
+        return False
+
+    try:
+        reload_status["in_progress"] = True
+        print(f"\n🔄 Reloading model ({version or 'registry ACTIVE'})...")
+
+        bundle = build_bundle(version)
+        previous, active = active, bundle
+
+        reload_status.update(last_version=bundle.version, last_error=None)
+        print(f"✅ Now serving model version {bundle.version}")
+
+        # Requests that grabbed the old bundle before the swap finish on it
+        if previous is not None:
+            previous.retire_when_idle()
+
+        return True
+
+    except Exception as e:
+        print("❌ Model reload failed, keeping current version:", e)
+        traceback.print_exc()
+        reload_status["last_error"] = str(e)
+        return False
+
+    finally:
+        reload_status.update(in_progress=False, finished_at=time.time())
+        _reload_lock.release()
+
+
+def start_background_reload(version=None):
+    thread = threading.Thread(target=reload_model, args=(version,), name="model-reloader", daemon=True)
+    thread.start()
+    return thread
+
+
+def reload_request(data):
+    """Start the reload asked for by an /admin/reload body; (response body, HTTP status)
+
+    An empty body reloads the registry's ACTIVE version.
+    """
+    if not isinstance(data, dict):
+        return {"success": False, "error": "Request body must be a JSON object"}, 400
+
+    version = data.get("version")
+    if version is not None and not is_version_name(version):
+        return {"success": False, "error": f"Invalid model version: {version!r}"}, 400
+
+    # Loads + warms off to the side; this worker keeps serving the old version
+    start_background_reload(version)
+    return {"success": True, "reloading": version or "registry ACTIVE"}, 202
+
+
+def install_reload_signal():
+    """SIGUSR2 -> reload the registry's ACTIVE version (main thread only)"""
+    signal.signal(signal.SIGUSR2, lambda signum, frame: start_background_reload())
+
+
+# ==============================
+# RESULT FORMATTING
+# ==============================
+
+def class_count_matches(bundle=None):
+    bundle = bundle or active
+    return bundle.model.output_shape[-1] == len(bundle.class_names)
+
+
+def format_prediction(row, bundle, trace=None):
+    started = time.perf_counter()
+    prediction = bundle.postprocessor.format(row)
+    record_stage("postprocess", time.perf_counter() - started, trace)
+    return prediction
+
+
+def format_predictions(rows, bundle):
+    """format_prediction for an (N, C) output matrix in one vectorized pass"""
+    started = time.perf_counter()
+    predictions = bundle.postprocessor.format_batch(rows)
+    record_stage("postprocess", time.perf_counter() - started)
+    return predictions
+
+
+# ==============================
+# PREDICTION CACHE
+# ==============================
+
+def cached_prediction(image_bytes, bundle, trace=None):
+    """(cache key, cached prediction or None) for a raw upload under this model version"""
+    if prediction_cache is None:
+        return None, None
+
+    started = time.perf_counter()
+    key = cache_key(image_bytes, bundle.cache_namespace)
+    prediction = prediction_cache.get(key)
+    record_stage("cache_lookup", time.perf_counter() - started, trace)
+
+    result = "miss" if prediction is None else "hit"
+    metrics.CACHE_LOOKUPS.inc(result=result)
+    if trace is not None:
+        trace.note("cache", result)
+
+    return key, prediction
+
+
+def remember_prediction(key, prediction):
+    """Queue the cache write; the request never waits for it"""
+    if prediction_cache is not None and key is not None:
+        _cache_writer.submit(prediction_cache.put, key, prediction).add_done_callback(_cache_write_done)
+
+
+def _cache_write_done(future):
+    error = future.exception()
+    if error is not None:
+        print("⚠️  Prediction cache write failed:", error)
+        metrics.count_error("cache", error)
+
+
+# ==============================
+# PREDICTION
+# ==============================
+
+def hold_active():
+    """The active bundle, counted as in flight until its release()"""
+    while True:
+        bundle = active
+        if bundle.hold():
+            return bundle
+        # Retired between reading `active` and holding it: a reload has swapped in another
+        if bundle is active:
+            raise RuntimeError(f"Model version {bundle.version} is shut down")
+
+
+def model_input_size(bundle=None):
+    """(height, width) the model takes; uploads at exactly this size skip the resize"""
+    bundle = bundle or active
+    return tuple(bundle.model.input_shape[1:3])
+
+
+def tensor_nbytes(bundle=None):
+    height, width = model_input_size(bundle)
+    return height * width * 3
+
+
+def tensor_pixels(tensor_bytes, bundle):
+    """(1, H, W, 3) uint8 view over a raw tensor body, no copy and no decode"""
+    height, width = model_input_size(bundle)
+    if len(tensor_bytes) != height * width * 3:
+        raise UploadRejected(
+            f"Tensor must be {height}x{width}x3 uint8 ({height * width * 3} bytes), got {len(tensor_bytes)}",
+            400
+        )
+    return np.frombuffer(tensor_bytes, dtype=np.uint8).reshape(1, height, width, 3)
+
+
+def submit_prediction(image_bytes, trace=None, tensor=False):
+    """Future for one upload's formatted top-k (raises DecodeQueueFull when saturated)
+
+    The whole request is pinned to the bundle active at admission, so a hot
+    reload mid-request never mixes one model's output with another's labels.
+    A tracing.Trace, if given, collects the per-stage timings. tensor=True
+    takes raw RGB uint8 pixels at the model input size and skips the decode.
+    """
+    bundle = hold_active()
+    try:
+        if trace is not None:
+            trace.note("model_version", bundle.version)
+            trace.note("input", "tensor" if tensor else "image")
+
+        pixels = tensor_pixels(image_bytes, bundle) if tensor else None
+        key, prediction = cached_prediction(image_bytes, bundle, trace)
+
+        if prediction is None:
+            if tensor:
+                row_future = bundle.decode_stage.submit_pixels(pixels, DECODE_ADMIT_TIMEOUT_MS / 1000, trace)
+            else:
+                row_future = bundle.decode_stage.submit_predict(image_bytes, DECODE_ADMIT_TIMEOUT_MS / 1000, trace)
+    except BaseException:
+        bundle.release()
+        raise
+
+    # The bundle stays held until this request's result is set
+    result = Future()
+    result.add_done_callback(lambda _: bundle.release())
+    if prediction is not None:
+        result.set_result(prediction)
+        return result
+
+    def finish(row_future):
+        try:
+            # Formatted with the rest of its batch, unless a near-duplicate hit skipped the model
+            row, prediction = row_future.result()
+            if prediction is None:
+                prediction = format_prediction(row, bundle, trace)
+            remember_prediction(key, prediction)
+            result.set_result(prediction)
+        except Exception as e:
+            result.set_exception(e)
+
+    row_future.add_done_callback(finish)
+    return result
+
+
+def predict_image(image_bytes, trace=None, tensor=False):
+    """Blocking: cache lookup, else decode on the pool, wait for the batcher, format top-k"""
+    return submit_prediction(image_bytes, trace, tensor).result()
+
+
+def predict_images(blobs):
+    """[(prediction, None) | (None, error)] for many uploads, misses run as one tensor"""
+    bundle = hold_active()
+    try:
+        return _predict_images(blobs, bundle)
+    finally:
+        bundle.release()
+
+
+def _predict_images(blobs, bundle):
+    lookups = [cached_prediction(data, bundle) for data in blobs]
+    misses = [i for i, (_, hit) in enumerate(lookups) if hit is None]
+
+    futures = []
+    try:
+        for i in misses:
+            futures.append(bundle.decode_stage.submit_decode(blobs[i], timeout=DECODE_ADMIT_TIMEOUT_MS / 1000))
+    except BaseException:
+        # The request fails (503 on DecodeQueueFull); hand the slots it already
+        # holds back to other requests instead of decoding for nothing
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+
+    outcomes = [(hit, None) for _, hit in lookups]
+    decoded = {}
+    for i, future in zip(misses, futures):
+        try:
+            decoded[i] = future.result()
+        except Exception as e:
+            print("❌ Image preprocessing error:", e)
+            metrics.count_error("decode", e)
+            outcomes[i] = (None, str(e))
+
+    # Near-duplicates of recent uploads reuse that row instead of the model
+    phashes = {}
+    if bundle.near_duplicates is not None:
+        for i in sorted(decoded):
+            started = time.perf_counter()
+            phash, row = bundle.near_duplicates.lookup(decoded[i][0])
+            record_stage("near_duplicate", time.perf_counter() - started)
+            if row is None:
+                phashes[i] = phash
+            else:
+                del decoded[i]
+                prediction = format_prediction(row, bundle)
+                remember_prediction(lookups[i][0], prediction)
+                outcomes[i] = (prediction, None)
+
+    # All remaining misses go through the model as one tensor, in upload order
+    if decoded:
+        order = sorted(decoded)
+        rows = bundle.batcher.predict_many(np.concatenate([decoded[i] for i in order], axis=0))
+        predictions = format_predictions(rows, bundle)
+
+        for i, row, prediction in zip(order, rows, predictions):
+            if i in phashes:
+                bundle.near_duplicates.add(phashes[i], row)
+            remember_prediction(lookups[i][0], prediction)
+            outcomes[i] = (prediction, None)
+
+    return outcomes
+
+
+# ==============================
+# PESTICIDE RECOMMENDATION
+# ==============================
+
+def pesticide_recommendation(data):
+    """Return (response body, HTTP status) for a /pesticide request body"""
+    if not isinstance(data, dict):
+        return {
+            "success": False,
+            "error": "Request body must be a JSON object"
+        }, 400
+
+    try:
+        disease = data.get("disease")
+        area = float(data.get("area_sqft"))
+        severity = data.get("severity", "moderate")
+
+        result = calculate_pesticide(disease, area, severity)
+
+        if not result:
+            return {
+                "success": False,
+                "message": "No pesticide data found"
+            }, 404
+
+        return {
+            "success": True,
+            "recommendation": result
+        }, 200
+
+    except Exception as e:
+        print("❌ Pesticide calculation error:", e)
+        metrics.count_error("pesticide", e)
+        return {
+            "success": False,
+            "error": str(e)
+        }, 500
+
+
+# ==============================
+# HEALTH
+# ==============================
+
+def health_info():
+    bundle = active
+    model = bundle.model if bundle else None
+
+    return {
+        "status": "running",
+        "model_loaded": model is not None,
+        "ready": model_ready,
+        "state": model_state,
+        "load_seconds": model_load_seconds,
+        "backend": MODEL_BACKEND,
+        "model_version": bundle.version if bundle else None,
+        "reload": dict(reload_status),
+        "threads": {"intra_op": INTRA_OP_THREADS, "inter_op": INTER_OP_THREADS},
+        "classes": len(bundle.class_names) if bundle else 0,
+        "input_shape": str(model.input_shape) if model else None,
+        "output_shape": str(model.output_shape) if model else None,
+        "postprocess": {
+            "top_k": bundle.postprocessor.k,
+            "temperature": bundle.postprocessor.temperature
+        } if bundle else None,
+        "batching": {
+            "max_batch_size": BATCH_MAX_SIZE,
+            "max_wait_ms": BATCH_MAX_WAIT_MS,
+            "queue_depth": bundle.batcher.queue_depth() if bundle else 0
+        },
+        "decode": {
+            "workers": DECODE_WORKERS,
+            "max_pending": DECODE_MAX_PENDING,
+            "pending": bundle.decode_stage.pending() if bundle else 0
+        },
+        "cache": prediction_cache.stats() if prediction_cache else {"backend": "off"},
+        "near_duplicates": (
+            bundle.near_duplicates.stats() if bundle and bundle.near_duplicates else {"enabled": False}
+        )
+    }
+
+
+def client_config():
+    """Upload contract for clients that downscale on-device (GET /predict/config)"""
+    bundle = active
+    height, width = model_input_size(bundle)
+
+    return {
+        "model_version": bundle.version,
+        "input_size": {"width": width, "height": height},
+        # Server-side resize is a plain stretch to the input size (as in training),
+        # so clients should stretch too rather than crop or letterbox
+        "resize": {"mode": "stretch", "filter": "bilinear"},
+        "preferred_format": "image/jpeg",
+        "jpeg_quality": CLIENT_JPEG_QUALITY,
+        "max_upload_bytes": UPLOAD_MAX_BYTES,
+        "accepted_content_types": [
+            "image/jpeg", "image/png", "image/webp", "image/bmp",
+            "multipart/form-data", TENSOR_CONTENT_TYPE
+        ],
+        "tensor": {
+            "content_type": TENSOR_CONTENT_TYPE,
+            "shape": [height, width, 3],
+            "dtype": "uint8",
+            "layout": "HWC, RGB, row-major",
+            "bytes": height * width * 3
+        }
+    }
+
+
+def registry_info():
+    return {
+        "active": active.version if active else None,
+        "registry_active": active_version(),
+        "versions": list_versions(),
+        "reload": dict(reload_status)
+    }
+
@@ -0,0 +1,433 @@
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dataset_utils import sample_dataset
+from run_info import git_commit
+
+
+# ==============================
+# CONFIG
+# ==============================
+# python loadtest.py                                   # app.py, default sweep
+# python loadtest.py --server gunicorn --workers 4
+# python loadtest.py --server none --url http://vm:5001 --rates 5 10 20
+#
+# Closed loop: N clients send back-to-back (max throughput at N in flight).
+# Open loop: Poisson arrivals at R req/s regardless of how fast the server
+# answers; latency is measured from the scheduled send time, so queueing
+# when the server falls behind shows up in the tail instead of being hidden.
+
+VAL_PATH = "dataset/val"
+REPORT_DIR = "benchmarks"
+
+PORT = 5056
+CONCURRENCY_LEVELS = [1, 4, 16, 32]
+ARRIVAL_RATES = [5, 10, 20, 40]
+DURATION_S = 30
+WARMUP_S = 3
+IMAGES_PER_CLASS = 5
+SAMPLE_INTERVAL_S = 0.5
+
+SERVER_COMMANDS = {
+    "app": [sys.executable, "app.py"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"],
+    "asgi": [sys.executable, "-m", "uvicorn", "app_async:app", "--host", "127.0.0.1"],
+}
+
+
+# ==============================
+# HTTP HELPERS
+# ==============================
+
+def encode_multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def post_image(url, data, timeout=60):
+    body, content_type = encode_multipart("image", "leaf.jpg", data)
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+
+def wait_ready(base_url, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2) as resp:
+                if json.load(resp).get("ready"):
+                    return True
+        except (urllib.error.URLError, ConnectionError, ValueError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def _send(url, data):
+    """(status, seconds) — HTTP errors and connection failures become a status"""
+    start = time.perf_counter()
+    try:
+        status = post_image(url, data)
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = "connection_error"
+    return status, time.perf_counter() - start
+
+
+# ==============================
+# IMAGE MIX
+# ==============================
+
+def load_mix(val_path=VAL_PATH, per_class=IMAGES_PER_CLASS, seed=42, resize=None):
+    """Upload bodies from the validation set, optionally re-encoded at `resize`
+
+    Re-encoding at e.g. 4032x3024 reproduces real 12 MP phone uploads.
+    """
+    paths, _, _ = sample_dataset(val_path, per_class, seed)
+    blobs = [open(p, "rb").read() for p in paths]
+
+    if resize:
+        from PIL import Image
+
+        resized = []
+        for blob in blobs:
+            with Image.open(io.BytesIO(blob)) as image:
+                buf = io.BytesIO()
+                image.convert("RGB").resize(resize).save(buf, "JPEG", quality=90)
+                resized.append(buf.getvalue())
+        blobs = resized
+
+    random.Random(seed).shuffle(blobs)
+    return blobs
+
+
+# ==============================
+# LOAD GENERATORS
+# ==============================
+
+def run_closed_loop(url, blobs, concurrency, duration):
+    """`concurrency` clients each sending the next request as soon as one returns"""
+    samples = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            sample = _send(url, blobs[i % len(blobs)])
+            with lock:
+                samples.append(sample)
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run_open_loop(url, blobs, rate, duration, max_in_flight=256, seed=0):
+    """Poisson arrivals at `rate` req/s; latency counted from the scheduled send"""
+    samples = []
+    lock = threading.Lock()
+    rng = np.random.default_rng(seed)
+
+    def fire(scheduled, data):
+        status, _ = _send(url, data)
+        with lock:
+            samples.append((status, time.perf_counter() - scheduled))
+
+    started = time.perf_counter()
+    scheduled = started
+    i = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        while True:
+            scheduled += rng.exponential(1.0 / rate)
+            if scheduled - started >= duration:
+                break
+
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            pool.submit(fire, scheduled, blobs[i % len(blobs)])
+            i += 1
+
+    result = summarize(samples, time.perf_counter() - started)
+    result["offered_rate"] = rate
+    return result
+
+
+def summarize(samples, wall):
+    ok = [seconds for status, seconds in samples if status == 200]
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    ms = np.array(ok) * 1000 if ok else np.zeros(1)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": len(samples) - len(ok),
+        "statuses": statuses,
+        "requests_per_sec": round(len(ok) / wall, 2),
+        "latency_ms_mean": round(float(ms.mean()), 1),
+        "latency_ms_p50": round(float(np.percentile(ms, 50)), 1),
+        "latency_ms_p95": round(float(np.percentile(ms, 95)), 1),
+        "latency_ms_p99": round(float(np.percentile(ms, 99)), 1),
+        "latency_ms_max": round(float(ms.max()), 1),
+    }
+
+
+# ==============================
+# CPU / RSS PER PROCESS (/proc)
+# ==============================
+
+def _children(pid):
+    """All descendant pids of `pid` (gunicorn / uvicorn workers, decode processes)"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime + stime, in clock ticks
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class ResourceSampler:
+    """Samples CPU % and RSS of the server and each of its workers during a run"""
+
+    def __init__(self, root_pid, interval_s=SAMPLE_INTERVAL_S):
+        self.root_pid = root_pid
+        self.interval_s = interval_s
+        self.enabled = root_pid is not None and os.path.isdir("/proc")
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_start = {}
+        self._cpu_last = {}
+        self._rss = {}
+
+    def _pids(self):
+        return [self.root_pid] + _children(self.root_pid)
+
+    def _sample(self):
+        for pid in self._pids():
+            try:
+                cpu, rss = _cpu_seconds(pid), _rss_mb(pid)
+            except OSError:
+                continue
+            self._cpu_start.setdefault(pid, cpu)
+            self._cpu_last[pid] = cpu
+            self._rss.setdefault(pid, []).append(rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def __enter__(self):
+        if self.enabled:
+            self._started = time.perf_counter()
+            self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    def report(self):
+        if not self.enabled:
+            return {}
+
+        wall = time.perf_counter() - self._started
+        report = {}
+        for pid, rss in self._rss.items():
+            cpu = self._cpu_last[pid] - self._cpu_start[pid]
+            report[str(pid)] = {
+                "role": "server" if pid == self.root_pid else "worker",
+                "cpu_percent": round(100 * cpu / wall, 1),
+                "rss_mb_mean": round(float(np.mean(rss)), 1),
+                "rss_mb_max": round(float(np.max(rss)), 1),
+            }
+        return report
+
+
+# ==============================
+# SERVER UNDER TEST
+# ==============================
+
+def start_server(kind, port, env=None):
+    """Launch app.py / gunicorn / uvicorn on `port`; returns the Popen"""
+    env = dict(os.environ if env is None else env)
+    env.update(PORT=str(port), BIND=f"127.0.0.1:{port}")
+
+    command = list(SERVER_COMMANDS[kind])
+    if kind == "asgi":
+        command += ["--port", str(port), "--workers", env.get("WEB_WORKERS", "1")]
+
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def stop_server(server):
+    if server is not None:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+# ==============================
+# RUN
+# ==============================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP load test for the AI service")
+    parser.add_argument("--server", choices=list(SERVER_COMMANDS) + ["none"], default="app",
+                        help="what to start locally ('none' = test --url as is)")
+    parser.add_argument("--url", default=None, help="base URL when --server none")
+    parser.add_argument("--workers", type=int, default=None, help="WEB_WORKERS for gunicorn / asgi")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=CONCURRENCY_LEVELS)
+    parser.add_argument("--rates", type=float, nargs="*", default=ARRIVAL_RATES)
+    parser.add_argument("--duration", type=float, default=DURATION_S)
+    parser.add_argument("--per-class", type=int, default=IMAGES_PER_CLASS)
+    parser.add_argument("--resize", default=None, help="re-encode uploads at WxH, e.g. 4032x3024")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="leave the prediction cache / near-duplicate reuse on (off by default "
+                             "so repeated images measure the full pipeline)")
+    parser.add_argument("--out", default=None, help="report path (default benchmarks/loadtest-<time>.json)")
+    parser.add_argument("--port", type=int, default=PORT)
+
+    args = parser.parse_args()
+    if args.server == "none" and not args.url:
+        parser.error("--url is required with --server none")
+    return args
+
+
+def run_sweep(url, blobs, concurrency_levels, rates, duration, server_pid=None, warmup_s=WARMUP_S):
+    """Closed-loop then open-loop runs; each entry includes per-process CPU / RSS"""
+    if warmup_s > 0:
+        run_closed_loop(url, blobs, max(concurrency_levels or [4]), warmup_s)
+
+    results = {"closed_loop": {}, "open_loop": {}}
+
+    for concurrency in concurrency_levels:
+        with ResourceSampler(server_pid) as sampler:
+            row = run_closed_loop(url, blobs, concurrency, duration)
+        row["processes"] = sampler.report()
+        results["closed_loop"][str(concurrency)] = row
+        print(f"✅ concurrency {concurrency:>3}: {row['requests_per_sec']:>7} req/s  "
+              f"p50 {row['latency_ms_p50']} ms  p99 {row['latency_ms_p99']} ms  errors {row['errors']}")
+
+    for rate in rates:
+        with ResourceSampler(server_pid) as sampler:
+            row = run_open_loop(url, blobs, rate, duration)
+        row["processes"] = sampler.report()
+        results["open_loop"][f"{rate:g}"] = row
+        print(f"✅ {rate:>6g} req/s offered: {row['requests_per_sec']:>7} req/s  "
+              f"p50 {row['latency_ms_p50']} ms  p99 {row['latency_ms_p99']} ms  errors {row['errors']}")
+
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print("🌿 AI service load test\n")
+
+    resize = tuple(int(v) for v in args.resize.lower().split("x")) if args.resize else None
+    blobs = load_mix(VAL_PATH, args.per_class, args.seed, resize)
+    print(f"📸 {len(blobs)} images from {VAL_PATH}" + (f", re-encoded at {args.resize}" if resize else ""))
+
+    env = dict(os.environ)
+    if args.workers:
+        env["WEB_WORKERS"] = str(args.workers)
+    if not args.keep_cache:
+        env.update(CACHE_BACKEND="off", PHASH_MAX_DISTANCE="-1")
+
+    server = None
+    if args.server == "none":
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.server, args.port, env)
+
+    try:
+        if not wait_ready(base_url):
+            print("❌ Server never became ready")
+            sys.exit(1)
+
+        results = run_sweep(
+            f"{base_url}/predict", blobs, args.concurrency, args.rates, args.duration,
+            server_pid=server.pid if server else None
+        )
+    finally:
+        stop_server(server)
+
+    report_path = args.out or os.path.join(REPORT_DIR, f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "cpu_count": os.cpu_count(),
+            "server": args.server,
+            "workers": env.get("WEB_WORKERS"),
+            "backend": env.get("MODEL_BACKEND", "keras"),
+            "cache": args.keep_cache,
+            "images": len(blobs),
+            "resize": args.resize,
+            "duration_s": args.duration,
+            "results": results,
+        }, f, indent=2)
+
+    print(f"\n📁 Report saved: {report_path}")
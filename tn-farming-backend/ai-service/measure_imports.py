@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+print("🌿 Import-time and cold-start measurement\n")
+
+# ==============================
+# CONFIG
+# ==============================
+
+REPORT_PATH = "benchmarks/cold_start.json"
+PORT = 5057
+
+MODULES = [
+    "numpy",
+    "PIL.Image",
+    "flask",
+    "starlette.applications",
+    "onnxruntime",
+    "tflite_runtime.interpreter",
+    "tensorflow",
+    "preprocessing",
+    "inference_service",
+    "app",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+# ==============================
+# PER-MODULE IMPORT COST
+# ==============================
+
+def import_cost(module):
+    """Cumulative import time (ms) from -X importtime, or None if not installed"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return None
+
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # Top-level entry for the requested module (no indentation)
+        if match and match.group(4) == module and len(match.group(3)) <= 1:
+            return round(int(match.group(2)) / 1000, 1)
+    return None
+
+
+# ==============================
+# PORT-OPEN / READY TIME
+# ==============================
+
+def cold_start():
+    env = dict(os.environ, MODEL_LOAD_MODE="background", PORT=str(PORT))
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "app.py"], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    port_open = ready = None
+    state = None
+    try:
+        deadline = started + 300
+        while time.perf_counter() < deadline and server.poll() is None:
+            if port_open is None:
+                try:
+                    socket.create_connection(("127.0.0.1", PORT), timeout=0.2).close()
+                    port_open = time.perf_counter() - started
+                except OSError:
+                    time.sleep(0.02)
+                    continue
+
+            with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health", timeout=2) as resp:
+                state = json.load(resp).get("state")
+            if state in ("ready", "failed"):
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "port_open_s": round(port_open, 2) if port_open else None,
+        "final_state": state,
+        "ready_s": round(ready, 2) if ready else None,
+    }
+
+
+if __name__ == "__main__":
+    imports = {}
+    print(f"{'module':<28}{'import ms':>10}")
+    for module in MODULES:
+        imports[module] = import_cost(module)
+        cost = "not installed" if imports[module] is None else imports[module]
+        print(f"{module:<28}{cost:>10}")
+
+    print("\n⏱️  Starting app.py with MODEL_LOAD_MODE=background...")
+    startup = cold_start()
+    print(f"   port open after {startup['port_open_s']}s, "
+          f"state '{startup['final_state']}' after {startup['ready_s']}s")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        json.dump({"imports_ms": imports, "startup": startup}, f, indent=2)
+
+    print(f"\n📁 Report saved: {REPORT_PATH}")
@@ -0,0 +1,265 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Prometheus text exposition without the prometheus_client dependency.
+#
+# Under gunicorn every worker has its own counters. With METRICS_DIR set,
+# each worker snapshots its values to <METRICS_DIR>/<pid>.json every
+# METRICS_FLUSH_S and /metrics on any worker sums all snapshots, so a scrape
+# sees the whole host. Files of exited workers are kept so counters never go
+# backwards; their gauges are dropped.
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_S = float(os.environ.get("METRICS_FLUSH_S", 2))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+REGISTRY = []
+
+
+# ==============================
+# METRIC TYPES
+# ==============================
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self):
+        """{label values: value} copy, safe to merge / serialize"""
+        with self._lock:
+            return {key: (list(v) if isinstance(v, list) else v) for key, v in self._values.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn=None):
+        super().__init__(name, help_text)
+        self.fn = fn
+
+    def snapshot(self):
+        try:
+            return {(): float(self.fn())} if self.fn else {}
+        except Exception:
+            return {}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Per-bucket (not cumulative) counts, then +Inf, then the sum
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[i] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+# ==============================
+# SERVICE METRICS
+# ==============================
+
+REQUEST_SECONDS = Histogram(
+    "ai_service_request_seconds", "End-to-end request latency", ("endpoint", "status")
+)
+STAGE_SECONDS = Histogram(
+    "ai_service_predict_stage_seconds",
+    "Time per /predict pipeline stage (preprocess and inference are per batch)",
+    ("stage",)
+)
+BATCH_SIZE = Histogram(
+    "ai_service_inference_batch_size", "Rows per model forward pass", buckets=BATCH_SIZE_BUCKETS
+)
+ERRORS = Counter("ai_service_errors_total", "Errors by where they happened and type", ("source", "type"))
+CACHE_LOOKUPS = Counter("ai_service_cache_lookups_total", "Prediction cache lookups", ("result",))
+
+BATCH_QUEUE_DEPTH = Gauge("ai_service_batch_queue_depth", "Items waiting for the micro-batcher")
+DECODE_PENDING = Gauge("ai_service_decode_pending", "Uploads admitted to the decode stage and not yet decoded")
+UPLOAD_BYTES_IN_FLIGHT = Gauge("ai_service_upload_bytes_in_flight", "Upload bytes reserved by in-flight requests")
+
+
+def count_error(source, error):
+    ERRORS.inc(source=source, type=type(error).__name__)
+
+
+# ==============================
+# MULTI-WORKER SNAPSHOTS
+# ==============================
+
+def _snapshot():
+    return {
+        m.name: [[list(key), value] for key, value in m.snapshot().items()]
+        for m in REGISTRY
+    }
+
+
+def flush(directory=METRICS_DIR):
+    """Write this process's values to <directory>/<pid>.json (atomically)"""
+    if not directory:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def start_flusher(directory=METRICS_DIR, interval_s=METRICS_FLUSH_S):
+    """Daemon thread flushing snapshots; call once per worker after fork"""
+    if not directory:
+        return None
+
+    def run():
+        while True:
+            try:
+                flush(directory)
+            except OSError as e:
+                print("⚠️  Metrics flush failed:", e)
+            time.sleep(interval_s)
+
+    thread = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+    thread.start()
+    return thread
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _other_workers(directory):
+    if not directory or not os.path.isdir(directory):
+        return
+
+    for filename in os.listdir(directory):
+        pid_text, ext = os.path.splitext(filename)
+        if ext != ".json" or not pid_text.isdigit() or int(pid_text) == os.getpid():
+            continue
+
+        try:
+            with open(os.path.join(directory, filename), "r") as f:
+                yield int(pid_text), json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def _merge(into, key, value):
+    current = into.get(key)
+    if current is None:
+        into[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(current, list):
+        into[key] = [a + b for a, b in zip(current, value)]
+    else:
+        into[key] = current + value
+
+
+# ==============================
+# EXPOSITION
+# ==============================
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(directory=METRICS_DIR):
+    """Prometheus text format for this process (plus other workers' snapshots)"""
+    values = {m.name: dict(m.snapshot()) for m in REGISTRY}
+
+    for pid, snapshot in _other_workers(directory):
+        alive = _pid_alive(pid)
+        for metric in REGISTRY:
+            if metric.kind == "gauge" and not alive:
+                continue
+            for key, value in snapshot.get(metric.name, []):
+                _merge(values[metric.name], tuple(key), value)
+
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+        for key, value in sorted(values[metric.name].items()):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                cumulative += count
+                labels = _format_labels(metric.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(metric.labelnames, key)
+            lines.append(f"{metric.name}_sum{labels} {_format_value(value[-1])}")
+            lines.append(f"{metric.name}_count{labels} {cumulative}")
+
+    return "\n".join(lines) + "\n"
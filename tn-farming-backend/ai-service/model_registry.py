@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+from prediction_cache import file_checksum
+
+
+# ==============================
+# CONFIG
+# ==============================
+# models/registry/
+#   ACTIVE                       <- version served on startup / default reload
+#   2026-10-01/
+#     plant_disease_model.keras  (and/or .onnx / _fp16.tflite / _int8.tflite)
+#     class_names.json
+#     manifest.json              <- sha256 of every file above
+
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "models/registry")
+ACTIVE_FILE = "ACTIVE"
+MANIFEST_FILE = "manifest.json"
+CLASS_NAMES_FILE = "class_names.json"
+
+
+class RegistryError(Exception):
+    """Missing version, missing file or checksum mismatch"""
+
+
+# ==============================
+# LOOKUP
+# ==============================
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Registered versions, oldest first"""
+    if not os.path.isdir(registry_dir):
+        return []
+
+    versions = [
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, MANIFEST_FILE))
+    ]
+    return sorted(versions, key=lambda v: read_manifest(v, registry_dir).get("created", 0))
+
+
+def is_version_name(version):
+    """A version is one plain directory name under the registry (no paths)"""
+    return (
+        isinstance(version, str)
+        and version not in ("", ".", "..")
+        and "/" not in version
+        and "\\" not in version
+        and os.path.basename(version) == version
+    )
+
+
+def read_manifest(version, registry_dir=REGISTRY_DIR):
+    if not is_version_name(version):
+        raise RegistryError(f"Invalid model version name: {version!r}")
+
+    path = os.path.join(registry_dir, version, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise RegistryError(f"Model version '{version}' is not registered")
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def active_version(registry_dir=REGISTRY_DIR):
+    """Version named in ACTIVE, else the newest registered one, else None"""
+    path = os.path.join(registry_dir, ACTIVE_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            version = f.read().strip()
+        if version:
+            return version
+
+    versions = list_versions(registry_dir)
+    return versions[-1] if versions else None
+
+
+def resolve(version, model_filename, registry_dir=REGISTRY_DIR):
+    """Verified (model path, class_names path) for one version and backend file"""
+    manifest = read_manifest(version, registry_dir)
+    files = manifest.get("files", {})
+
+    for filename in (model_filename, CLASS_NAMES_FILE):
+        if filename not in files:
+            raise RegistryError(f"Version '{version}' has no {filename}")
+
+        path = os.path.join(registry_dir, version, filename)
+        if not os.path.exists(path):
+            raise RegistryError(f"Version '{version}' is missing {filename} on disk")
+
+        if file_checksum(path) != files[filename]:
+            raise RegistryError(f"Checksum mismatch for {version}/{filename}")
+
+    version_dir = os.path.join(registry_dir, version)
+    return os.path.join(version_dir, model_filename), os.path.join(version_dir, CLASS_NAMES_FILE)
+
+
+# ==============================
+# REGISTER / ACTIVATE
+# ==============================
+
+def register(version, model_paths, class_names_path, registry_dir=REGISTRY_DIR, notes="", temperature=None):
+    """Copy model file(s) + class_names.json into a new version with checksums
+
+    temperature: calibration fitted for this model (postprocess.fit_temperature),
+    applied to its probabilities at serving time.
+    """
+    if not is_version_name(version):
+        raise RegistryError(f"Invalid model version name: {version!r}")
+
+    version_dir = os.path.join(registry_dir, version)
+    if os.path.exists(version_dir):
+        raise RegistryError(f"Version '{version}' already exists")
+
+    os.makedirs(version_dir)
+    files = {}
+    for src in list(model_paths) + [class_names_path]:
+        dst = os.path.join(version_dir, os.path.basename(src))
+        shutil.copy2(src, dst)
+        files[os.path.basename(src)] = file_checksum(dst)
+
+    manifest = {"version": version, "created": time.time(), "files": files, "notes": notes}
+    if temperature is not None:
+        manifest["temperature"] = float(temperature)
+
+    # Manifest last: a version only becomes visible once every file is in place
+    with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    read_manifest(version, registry_dir)
+
+    tmp_path = os.path.join(registry_dir, ACTIVE_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(registry_dir, ACTIVE_FILE))
+
+
+# ==============================
+# CLI
+# ==============================
+# python model_registry.py list
+# python model_registry.py register <version> <model file>... [--activate] [--temperature=1.4]
+# python model_registry.py verify <version>
+# python model_registry.py activate <version>
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+
+    if command == "list":
+        current = active_version()
+        for version in list_versions():
+            files = ", ".join(read_manifest(version).get("files", {}))
+            print(f"{'➡️ ' if version == current else '   '} {version}: {files}")
+
+    elif command == "register":
+        version, paths = args[1], [a for a in args[2:] if not a.startswith("--")]
+        temperature = next((float(a.split("=", 1)[1]) for a in args if a.startswith("--temperature=")), None)
+        manifest = register(version, paths, "models/class_names.json", temperature=temperature)
+        print(f"✅ Registered {version}: {list(manifest['files'])}")
+        if "--activate" in args:
+            activate(version)
+            print(f"➡️  {version} is now ACTIVE")
+
+    elif command == "verify":
+        version = args[1]
+        for filename in read_manifest(version)["files"]:
+            if filename != CLASS_NAMES_FILE:
+                resolve(version, filename)
+        print(f"✅ {version}: all checksums match")
+
+    elif command == "activate":
+        activate(args[1])
+        print(f"➡️  {args[1]} is now ACTIVE")
+
+    else:
+        print(f"❌ Unknown command '{command}'")
+        sys.exit(1)
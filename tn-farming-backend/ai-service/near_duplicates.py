@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+# ==============================
+# PERCEPTUAL HASH (dHash)
+# ==============================
+
+HASH_SIZE = 8
+
+
+def dhash(pixels, hash_size=HASH_SIZE):
+    """64-bit difference hash of a (H, W, 3) uint8 image
+
+    Grayscale thumbnail of (hash_size + 1) x hash_size, one bit per
+    "is this pixel brighter than its right neighbour". Survives JPEG
+    re-compression, resizing and small crops.
+    """
+    thumb = Image.fromarray(pixels).convert("L").resize((hash_size + 1, hash_size), Image.BOX)
+    grid = np.asarray(thumb, dtype=np.int16)
+    bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), -1).sum(axis=1)
+
+
+# ==============================
+# NEAR-DUPLICATE INDEX
+# ==============================
+
+class NearDuplicateIndex:
+    """Ring buffer of recent (hash, prediction row) pairs, searched by Hamming distance
+
+    A vectorized XOR + popcount over a few thousand uint64 hashes costs tens
+    of microseconds — far below one forward pass.
+    """
+
+    def __init__(self, max_distance=4, capacity=8192):
+        self.max_distance = int(max_distance)
+        self.capacity = max(1, int(capacity))
+
+        self._hashes = np.zeros(self.capacity, dtype=np.uint64)
+        self._rows = [None] * self.capacity
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, pixels):
+        """(hash, cached row or None) for a decoded (H, W, 3) uint8 image"""
+        phash = dhash(pixels)
+        return phash, self.lookup_hash(phash)
+
+    def lookup_hash(self, phash):
+        with self._lock:
+            # A flat image (no gradients) hashes to 0 and would match every
+            # other flat image — never reuse across those
+            if phash == 0:
+                self.misses += 1
+                return None
+
+            if self._count:
+                distances = _popcount(self._hashes[:self._count] ^ np.uint64(phash))
+                best = int(distances.argmin())
+
+                if distances[best] <= self.max_distance:
+                    self.hits += 1
+                    return self._rows[best]
+
+            self.misses += 1
+            return None
+
+    def add(self, phash, row):
+        if phash == 0:
+            return
+
+        with self._lock:
+            self._hashes[self._next] = phash
+            self._rows[self._next] = row
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_distance": self.max_distance,
+            "size": self._count,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "forward_passes_saved": self.hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from disease_classes import format_disease_name, is_healthy
+
+
+# ==============================
+# CONFIG
+# ==============================
+# TOP_K: alternatives returned per image. "top_3" in the response always holds
+# the first three of them, for clients written against the original format.
+#
+# CALIBRATION_TEMPERATURE: temperature scaling of the model's probabilities,
+# softmax(log(p) / T). T > 1 softens an over-confident model, 1.0 leaves the
+# output untouched. A registry version can carry its own fitted value
+# (manifest "temperature", see fit_temperature), which takes precedence.
+
+TOP_K = int(os.environ.get("TOP_K", 3))
+CALIBRATION_TEMPERATURE = float(os.environ.get("CALIBRATION_TEMPERATURE", 1.0))
+
+# Probabilities are clipped before the log so an exact 0 stays finite
+_EPSILON = 1e-12
+
+
+# ==============================
+# CALIBRATION
+# ==============================
+
+def calibrate(probabilities, temperature=1.0):
+    """Temperature-scaled (N, C) probabilities; rows still sum to 1"""
+    if temperature == 1.0:
+        return probabilities
+
+    logits = np.log(np.clip(probabilities, _EPSILON, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    scaled = np.exp(logits)
+    scaled /= scaled.sum(axis=1, keepdims=True)
+    return scaled
+
+
+def fit_temperature(probabilities, labels, temperatures=None):
+    """Temperature minimising validation NLL for (N, C) probabilities and (N,) labels"""
+    if temperatures is None:
+        temperatures = np.round(np.arange(0.5, 5.0001, 0.05), 2)
+
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    rows = np.arange(len(labels))
+
+    def nll(t):
+        return -np.log(np.clip(calibrate(probabilities, t)[rows, labels], _EPSILON, 1.0)).mean()
+
+    return float(min(temperatures, key=nll))
+
+
+# ==============================
+# TOP-K
+# ==============================
+
+def top_k(probabilities, k):
+    """(indices, scores) of the k best classes per row, best first, shape (N, k)
+
+    argpartition finds the k candidates in O(C) per row; only those k are
+    sorted, instead of a full argsort over every class.
+    """
+    k = min(k, probabilities.shape[1])
+    candidates = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+    scores = np.take_along_axis(probabilities, candidates, axis=1)
+
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+# ==============================
+# RESPONSE ASSEMBLY
+# ==============================
+
+class Postprocessor:
+    """Model outputs -> prediction dicts for one class list
+
+    Display names and healthy flags are looked up once per model version, so
+    formatting a batch is a handful of array ops plus k dicts per image.
+    """
+
+    def __init__(self, class_names, k=TOP_K, temperature=CALIBRATION_TEMPERATURE):
+        self.k = max(1, int(k))
+        self.temperature = float(temperature)
+
+        self.class_names = np.array(class_names, dtype=object)
+        # Collapse the double spaces "Tomato__Target_Spot"-style names leave behind
+        self.display_names = np.array([" ".join(format_disease_name(n).split()) for n in class_names], dtype=object)
+        self.healthy = np.array([is_healthy(n) for n in class_names], dtype=bool)
+
+    @property
+    def signature(self):
+        """Settings that change the response, for the prediction cache namespace"""
+        return f"k{self.k}:t{self.temperature:g}"
+
+    def format_batch(self, outputs):
+        """[prediction dict] for an (N, C) output matrix, one per row"""
+        probabilities = calibrate(np.asarray(outputs, dtype=np.float64).reshape(len(outputs), -1), self.temperature)
+        indices, scores = top_k(probabilities, self.k)
+
+        # One conversion to Python objects per field for the whole batch
+        names = self.class_names[indices].tolist()
+        display = self.display_names[indices].tolist()
+        healthy = self.healthy[indices].tolist()
+        confidence = np.round(scores * 100, 2).tolist()
+
+        predictions = []
+        for row in range(len(indices)):
+            results = [
+                {
+                    "class": names[row][j],
+                    "display_name": display[row][j],
+                    "healthy": healthy[row][j],
+                    "confidence": confidence[row][j]
+                }
+                for j in range(len(names[row]))
+            ]
+            predictions.append({
+                "primary": results[0],
+                "healthy": results[0]["healthy"],
+                "top_k": results,
+                "top_3": results[:3]
+            })
+
+        return predictions
+
+    def format(self, row):
+        """Prediction dict for a single output row"""
+        return self.format_batch(np.asarray(row)[np.newaxis, ...])[0]
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# ==============================
+# CACHE KEYS
+# ==============================
+
+def cache_key(image_bytes, model_version):
+    """Hash of the raw upload, namespaced by model version"""
+    digest = hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+    return f"{model_version}:{digest}"
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# ==============================
+# IN-PROCESS LRU
+# ==============================
+
+class LRUCache:
+    """Bounded LRU with per-entry TTL and hit/miss counters"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries=2048, ttl_s=3600):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ==============================
+# SHARED ON-DISK (SQLite)
+# ==============================
+
+class SQLiteCache(LRUCache):
+    """SQLite file shared by every worker on the host, with a small LRU in front
+
+    Counters are per process; size/evictions reflect the shared table.
+    Expired and least-recently-used rows are pruned every `prune_every` puts
+    rather than on each one, so the table may run up to that many rows over
+    max_entries in between.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path, max_entries=2048, ttl_s=3600, local_entries=256, prune_every=64):
+        super().__init__(max_entries, ttl_s)
+        self.path = path
+        self.prune_every = max(1, int(prune_every))
+        self._local = LRUCache(local_entries, ttl_s)
+        self._conn = threading.local()
+        self._puts = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON predictions (last_used)")
+
+    def _connect(self):
+        conn = getattr(self._conn, "db", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.db = conn
+        return conn
+
+    def get(self, key):
+        value = self._local.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM predictions WHERE key = ?", (key,)
+        ).fetchone()
+
+        with self._lock:
+            if row is None or row[1] < now:
+                self.misses += 1
+                if row is not None:
+                    self.expirations += 1
+                return None
+            self.hits += 1
+
+        conn.execute("UPDATE predictions SET last_used = ? WHERE key = ?", (now, key))
+        value = json.loads(row[0])
+        self._local.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self._local.put(key, value)
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO predictions (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl_s, now)
+        )
+
+        with self._lock:
+            self._puts += 1
+            if self._puts % self.prune_every:
+                return
+
+        self.prune(now)
+
+    def prune(self, now=None):
+        """Drop expired rows, then least-recently-used rows beyond max_entries"""
+        now = now or time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM predictions WHERE expires_at < ?", (now,))
+        evicted = conn.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            " SELECT key FROM predictions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+
+        if evicted > 0:
+            with self._lock:
+                self.evictions += evicted
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+# ==============================
+# FACTORY
+# ==============================
+
+def make_cache(backend, max_entries=2048, ttl_s=3600, path=None):
+    """memory | sqlite | off"""
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        return SQLiteCache(path, max_entries, ttl_s)
+    if backend == "memory":
+        return LRUCache(max_entries, ttl_s)
+    raise ValueError(f"Unknown cache backend '{backend}', expected memory, sqlite or off")
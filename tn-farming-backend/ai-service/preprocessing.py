@@ -0,0 +1,177 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+
+# ==============================
+# CONFIG
+# ==============================
+
+IMG_SIZE = 224
+
+# Bilinear on a DCT-downscaled image is visually identical to the old bicubic
+# resize of the full image at this size, and several times cheaper
+RESIZE_FILTER = Image.BILINEAR
+
+PIXEL_SCALE = np.float32(1.0 / 255.0)
+
+
+# ==============================
+# DECODE + RESIZE
+# ==============================
+
+class BufferFile(io.RawIOBase):
+    """Read-only file over a bytearray / memoryview without copying it
+
+    io.BytesIO shares a bytes object but copies anything else, which would
+    double the memory of a streamed upload (see uploads.read_stream).
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def open_image(image_bytes):
+    if isinstance(image_bytes, bytes):
+        return Image.open(io.BytesIO(image_bytes))
+    return Image.open(BufferFile(image_bytes))
+
+
+def decode_image(image_bytes, size=(IMG_SIZE, IMG_SIZE), out=None):
+    """Decode to a (H, W, 3) uint8 array at `size` (PIL's (width, height)), optionally into `out`"""
+    image = open_image(image_bytes)
+
+    # JPEG only: let libjpeg scale by 1/2, 1/4 or 1/8 during decode so a 12 MP
+    # phone photo lands near 224 px instead of being fully decoded. Uploads the
+    # client already resized to the model input (GET /predict/config) skip both
+    # this and the resize.
+    if image.size != tuple(size):
+        image.draft("RGB", size)
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    if image.size != tuple(size):
+        image = image.resize(size, RESIZE_FILTER)
+
+    pixels = np.asarray(image)
+
+    if out is None:
+        return pixels
+
+    out[...] = pixels
+    return out
+
+
+def decode_for_model(image_bytes, size=(IMG_SIZE, IMG_SIZE)):
+    """(1, H, W, 3) uint8 batch item; module-level so process pools can pickle it"""
+    return decode_image(image_bytes, size)[np.newaxis, ...]
+
+
+# ==============================
+# NORMALIZATION
+# ==============================
+
+def to_model_input(images, out=None):
+    """uint8 [0, 255] -> float32 [0, 1] in one fused pass, optionally into `out`"""
+    if images.dtype == np.uint8:
+        return np.multiply(images, PIXEL_SCALE, out=out, dtype=np.float32, casting="unsafe")
+
+    if out is None:
+        return images.astype(np.float32, copy=False)
+
+    out[...] = images
+    return out
+
+
+def reference_preprocess(image_bytes, size=(IMG_SIZE, IMG_SIZE)):
+    """Original pipeline (full decode, default resize, separate /255) for comparison"""
+    image = Image.open(io.BytesIO(image_bytes))
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image = image.resize(size)
+
+    img_array = np.array(image, dtype=np.float32)
+    return img_array / 255.0
+
+
+# ==============================
+# BENCHMARK
+# ==============================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from dataset_utils import sample_dataset
+
+    VAL_PATH = sys.argv[1] if len(sys.argv) > 1 else "dataset/val"
+    PHONE_SIZE = (4032, 3024)
+    SAMPLES_PER_CLASS = 4
+
+    print("🌿 Decode + preprocess benchmark\n")
+
+    paths, _, _ = sample_dataset(VAL_PATH, SAMPLES_PER_CLASS)
+
+    def as_phone_photo(path):
+        # Re-encode at 12 MP so the benchmark reflects real uploads
+        with Image.open(path) as image:
+            buf = io.BytesIO()
+            image.convert("RGB").resize(PHONE_SIZE).save(buf, "JPEG", quality=90)
+            return buf.getvalue()
+
+    datasets = {
+        "dataset": [open(p, "rb").read() for p in paths],
+        "12MP": [as_phone_photo(p) for p in paths[:len(paths) // 2]],
+    }
+
+    def bench(fn, blobs):
+        times = []
+        for blob in blobs:
+            start = time.perf_counter()
+            fn(blob)
+            times.append(time.perf_counter() - start)
+        return np.array(times) * 1000
+
+    staging = np.empty((IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+    batch_slot = np.empty((IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+
+    def fast(blob):
+        return to_model_input(decode_image(blob, out=staging), out=batch_slot)
+
+    for label, blobs in datasets.items():
+        old = bench(reference_preprocess, blobs)
+        new = bench(fast, blobs)
+
+        drift = max(
+            float(np.abs(reference_preprocess(b) - fast(b)).mean()) for b in blobs[:8]
+        )
+
+        print(f"📸 {label} ({len(blobs)} images)")
+        print(f"   original : mean {old.mean():7.2f} ms  p50 {np.median(old):7.2f} ms")
+        print(f"   fast path: mean {new.mean():7.2f} ms  p50 {np.median(new):7.2f} ms")
+        print(f"   speed-up : {old.mean() / new.mean():.1f}x, mean |Δpixel| {drift:.4f}\n")
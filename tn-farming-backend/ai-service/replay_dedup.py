@@ -0,0 +1,149 @@
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+
+from PIL import Image
+
+from dataset_utils import IMAGE_EXTENSIONS, sample_dataset
+from near_duplicates import NearDuplicateIndex, dhash
+from preprocessing import decode_image
+
+print("🌿 Duplicate / near-duplicate replay\n")
+
+# ==============================
+# CONFIG
+# ==============================
+# python replay_dedup.py [TRAFFIC_DIR]
+#
+# TRAFFIC_DIR: logged uploads, replayed in file modification order. If it is
+# laid out one folder per class, near-duplicate matches across classes are
+# counted as false matches. Without it, traffic is simulated from dataset/val
+# with the retry / re-compress / crop patterns seen from the mobile app.
+
+TRAFFIC_DIR = sys.argv[1] if len(sys.argv) > 1 else None
+VAL_PATH = "dataset/val"
+REPORT_PATH = "benchmarks/dedup_replay.json"
+
+DISTANCES = [0, 2, 4, 6, 8, 10]
+
+SIM_IMAGES_PER_CLASS = 40
+SIM_RETRY_RATE = 0.15       # byte-identical re-send after a timeout
+SIM_RECOMPRESS_RATE = 0.10  # app re-encodes before re-sending
+SIM_CROP_RATE = 0.05        # user re-frames the same leaf slightly
+
+# ==============================
+# TRAFFIC
+# ==============================
+
+
+def logged_traffic(root):
+    uploads = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                label = os.path.relpath(dirpath, root)
+                uploads.append((os.path.getmtime(path), path, label))
+
+    uploads.sort()
+    for _, path, label in uploads:
+        with open(path, "rb") as f:
+            yield f.read(), (label if label != "." else None)
+
+
+def variant(data, kind, rng):
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        if kind == "crop":
+            w, h = image.size
+            dx, dy = int(w * rng.uniform(0.02, 0.06)), int(h * rng.uniform(0.02, 0.06))
+            image = image.crop((dx, dy, w - dx, h - dy))
+        buf = io.BytesIO()
+        image.save(buf, "JPEG", quality=rng.randint(60, 80))
+        return buf.getvalue()
+
+
+def simulated_traffic():
+    rng = random.Random(7)
+    paths, labels, class_names = sample_dataset(VAL_PATH, SIM_IMAGES_PER_CLASS)
+    traffic = []
+
+    for path, label in zip(paths, labels):
+        with open(path, "rb") as f:
+            data = f.read()
+        traffic.append((data, class_names[label]))
+
+        if rng.random() < SIM_RETRY_RATE:
+            traffic.append((data, class_names[label]))
+        if rng.random() < SIM_RECOMPRESS_RATE:
+            traffic.append((variant(data, "recompress", rng), class_names[label]))
+        if rng.random() < SIM_CROP_RATE:
+            traffic.append((variant(data, "crop", rng), class_names[label]))
+
+    rng.shuffle(traffic)
+    return traffic
+
+
+# ==============================
+# REPLAY
+# ==============================
+
+traffic = list(logged_traffic(TRAFFIC_DIR)) if TRAFFIC_DIR else simulated_traffic()
+
+seen_bytes = set()
+requests = []  # (exact duplicate?, dhash, label)
+for data, label in traffic:
+    digest = hashlib.blake2b(data, digest_size=20).digest()
+    exact = digest in seen_bytes
+    seen_bytes.add(digest)
+    requests.append((exact, None if exact else dhash(decode_image(data)), label))
+
+total = len(requests)
+exact_hits = sum(1 for exact, _, _ in requests if exact)
+
+print(f"📁 {total} uploads ({'logged: ' + TRAFFIC_DIR if TRAFFIC_DIR else 'simulated from ' + VAL_PATH})")
+print(f"🔁 Byte-identical re-sends (content-hash cache): {exact_hits}\n")
+
+report = {
+    "source": TRAFFIC_DIR or f"simulated:{VAL_PATH}",
+    "uploads": total,
+    "exact_duplicates": exact_hits,
+    "by_distance": {},
+}
+
+print(f"{'distance':>9}{'near hits':>11}{'passes saved':>14}{'saved %':>9}{'cross-class':>13}")
+
+for distance in DISTANCES:
+    index = NearDuplicateIndex(max_distance=distance, capacity=max(1, total))
+    near_hits = cross_class = 0
+
+    for exact, phash, label in requests:
+        if exact:
+            continue
+        matched_label = index.lookup_hash(phash)
+        if matched_label is None:
+            index.add(phash, label)
+        else:
+            near_hits += 1
+            if label is not None and matched_label != label:
+                cross_class += 1
+
+    saved = exact_hits + near_hits
+    report["by_distance"][distance] = {
+        "near_duplicate_hits": near_hits,
+        "forward_passes_saved": saved,
+        "saved_fraction": round(saved / total, 4) if total else 0.0,
+        "cross_class_matches": cross_class,
+    }
+
+    print(f"{distance:>9}{near_hits:>11}{saved:>14}{saved / max(total, 1):>9.1%}{cross_class:>13}")
+
+os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+with open(REPORT_PATH, "w") as f:
+    json.dump(report, f, indent=2)
+
+print(f"\n📁 Report saved: {REPORT_PATH}")
+print("💡 Pick the largest distance with zero cross-class matches for PHASH_MAX_DISTANCE")
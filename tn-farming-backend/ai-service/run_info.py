@@ -0,0 +1,15 @@
+import subprocess
+
+
+# ==============================
+# RUN METADATA
+# ==============================
+# Recorded in benchmark reports and training runs, so results can be traced
+# back to the code that produced them.
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
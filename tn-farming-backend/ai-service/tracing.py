@@ -0,0 +1,158 @@
+import cProfile
+import heapq
+import itertools
+import os
+import pstats
+import threading
+import time
+
+import metrics
+
+
+# ==============================
+# CONFIG
+# ==============================
+# off:    no per-request traces (default)
+# header: trace requests sent with "X-Debug-Trace: 1"
+# all:    trace every /predict request
+#
+# A traced response carries a "debug" field with the per-stage breakdown.
+# With TRACE_PROFILE_TOP_N > 0 traced requests are also run under cProfile
+# (decode worker + inference thread) and the slowest N are kept as .prof
+# files in TRACE_PROFILE_DIR — open with `python -m pstats` or snakeviz.
+
+TRACE_MODE = os.environ.get("TRACE_MODE", "off")
+TRACE_HEADER = "X-Debug-Trace"
+TRACE_PROFILE_TOP_N = int(os.environ.get("TRACE_PROFILE_TOP_N", 0))
+TRACE_PROFILE_DIR = os.environ.get("TRACE_PROFILE_DIR", "profiles")
+
+
+# ==============================
+# TRACE
+# ==============================
+
+class Trace:
+    """Stage timings for one request, filled in from whichever thread ran the stage"""
+
+    def __init__(self, profile=False):
+        self.started = time.perf_counter()
+        self.profile = profile
+        self.stages = {}
+        self.info = {"request_thread": threading.current_thread().name}
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def note(self, key, value):
+        self.info[key] = value
+
+    def add_profile(self, profiler):
+        with self._lock:
+            self.profiles.append(profiler)
+
+    def summary(self, total_s):
+        stages_ms = {stage: round(s * 1000, 3) for stage, s in self.stages.items()}
+
+        # Wall time the decode worker spent off-CPU: GIL or core contention
+        if "decode_run" in self.stages and "decode_cpu" in self.stages:
+            stages_ms["decode_wait"] = round((self.stages["decode_run"] - self.stages["decode_cpu"]) * 1000, 3)
+
+        return {
+            "total_ms": round(total_s * 1000, 3),
+            "stages_ms": stages_ms,
+            **self.info
+        }
+
+
+def start_trace(header_value=None):
+    """A Trace if this request should be traced under TRACE_MODE, else None"""
+    if TRACE_MODE == "all" or (TRACE_MODE == "header" and (header_value or "").lower() in ("1", "true", "yes")):
+        return Trace(profile=TRACE_PROFILE_TOP_N > 0)
+    return None
+
+
+def record_stage(stage, seconds, trace=None):
+    """Observe a stage in the /metrics histogram and, if traced, on the request"""
+    metrics.STAGE_SECONDS.observe(seconds, stage=stage)
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def start_profiler():
+    """Enabled cProfile.Profile, or None if another profiler is already active (3.12+)"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def traced_call(fn, arg, profile=False):
+    """(fn(arg), wall s, thread CPU s, profiler or None) — runs on the worker thread"""
+    profiler = start_profiler() if profile else None
+    started, cpu_started = time.perf_counter(), time.thread_time()
+
+    try:
+        result = fn(arg)
+    finally:
+        wall, cpu = time.perf_counter() - started, time.thread_time() - cpu_started
+        if profiler is not None:
+            profiler.disable()
+
+    return result, wall, cpu, profiler
+
+
+# ==============================
+# SLOWEST-N PROFILE DUMPS
+# ==============================
+
+class SlowestProfiles:
+    """Keep cProfile dumps for only the N slowest traced requests seen so far"""
+
+    def __init__(self, directory=TRACE_PROFILE_DIR, keep=TRACE_PROFILE_TOP_N):
+        self.directory = directory
+        self.keep = keep
+        self._heap = []  # (total_s, path), fastest first
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, trace, total_s):
+        """Dump the trace's profiles if it is among the slowest N; returns the path or None"""
+        if self.keep <= 0 or not trace.profiles:
+            return None
+
+        with self._lock:
+            if len(self._heap) >= self.keep and total_s <= self._heap[0][0]:
+                return None
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(
+                self.directory,
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._seq)}-{total_s * 1000:.0f}ms.prof"
+            )
+            pstats.Stats(*trace.profiles).dump_stats(path)
+
+            heapq.heappush(self._heap, (total_s, path))
+            if len(self._heap) > self.keep:
+                _, evicted = heapq.heappop(self._heap)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+            return path
+
+
+slowest_profiles = SlowestProfiles()
+
+
+def finish_trace(trace):
+    """Close the trace: total time, optional profile dump, and the debug summary"""
+    total_s = time.perf_counter() - trace.started
+    summary = trace.summary(total_s)
+    summary["profile"] = slowest_profiles.offer(trace, total_s)
+    return summary
@@ -1,146 +1,457 @@
 import tensorflow as tf
-from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras import layers, models
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+import argparse
 import json
 import os
-
-print("🌿 Plant Disease Training Starting...\n")
+import shutil
+import time
+
+from bench_inference import time_predict
+from data_pipeline import EpochTimer, make_dataset, make_shard_dataset
+from dataset_shards import SHARDS_DIR, ShardedSplit, check_source, read_index, source_fingerprint
+from dataset_utils import list_dataset
+from feature_cache import FEATURE_AUGMENT_COPIES, cached_features
+from inference_backends import KerasBackend
+from run_info import git_commit
+from train_setup import PRECISIONS, build_model, configure_precision, float32_model, unfreeze_top
 
 # ==============================
 # CONFIG
 # ==============================
+# Every setting below is a CLI flag; --config reads them from a JSON file
+# first (flags given on the command line still win). A run's own config.json
+# is a valid --config, so any run can be repeated exactly.
+#
+# python train_model.py
+# python train_model.py --batch-size 64 --alpha 0.75 --fine-tune-layers 50 --name a075
+# python train_model.py --config runs/20260101-120000-a075/config.json --intra-op-threads 8
+#
+# Each run writes runs/<time>[-<name>]/:
+#   config.json       resolved settings, git commit, TF version, CPU count
+#   epochs.jsonl      one line per epoch: stage, seconds, images/sec, loss/accuracy
+#   summary.json      stage times, throughput, final val accuracy, model size and latency
+#   model.keras       the float32 model, plus class_names.json
+#   best_model.keras  ModelCheckpoint (training precision)
 
 TRAIN_PATH = "dataset/train"
 VAL_PATH = "dataset/val"
 
 IMG_SIZE = 224
 BATCH_SIZE = 32
+ALPHA = 1.0
 EPOCHS_STAGE1 = 8
 EPOCHS_STAGE2 = 8
-
-# ==============================
-# DATA GENERATORS
-# ==============================
-
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
-    rotation_range=20,
-    zoom_range=0.2,
-    horizontal_flip=True
-)
-
-val_datagen = ImageDataGenerator(
-    rescale=1./255
+LEARNING_RATE_STAGE1 = 1e-3
+LEARNING_RATE_STAGE2 = 1e-4
+FINE_TUNE_LAYERS = 30
+
+# tfdata: parallel decode + in-memory cache + on-graph augmentation (data_pipeline.py)
+# shards: pre-decoded uint8 shards, no decode at all (python dataset_shards.py build)
+# keras:  the original single-threaded ImageDataGenerator, for comparison
+PIPELINES = ("tfdata", "shards", "keras")
+INPUT_PIPELINE = os.environ.get("TRAIN_PIPELINE", "tfdata")
+
+# Stage 1 on cached backbone features (feature_cache.py) instead of images:
+# the frozen backbone runs once per image rather than once per epoch. The
+# head then sees FEATURE_AUGMENT_COPIES fixed augmentations, not fresh ones.
+STAGE1_FEATURES = os.environ.get("STAGE1_FEATURES", "0") == "1"
+
+RUNS_DIR = "runs"
+
+# Where the finished model is installed for serving (--no-install to skip)
+MODEL_PATH = "models/plant_disease_model.keras"
+CLASS_NAMES_PATH = "models/class_names.json"
+
+# Counts where a negative value has no meaning (and would silently do
+# something else, e.g. a negative layer count in unfreeze_top)
+NON_NEGATIVE_SETTINGS = (
+    "fine_tune_layers", "epochs_stage1", "epochs_stage2", "feature_copies",
+    "intra_op_threads", "inter_op_threads", "latency_runs"
 )
 
-train_generator = train_datagen.flow_from_directory(
-    TRAIN_PATH,
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode='categorical'
-)
+# Forward-pass latency of the saved model, measured like bench_inference.py
+LATENCY_BATCH_SIZES = [1, 32]
+LATENCY_RUNS = 50
 
-val_generator = val_datagen.flow_from_directory(
-    VAL_PATH,
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode='categorical'
-)
 
 # ==============================
-# SAVE CLASS NAMES
+# ARGUMENTS
 # ==============================
 
-class_names = list(train_generator.class_indices.keys())
+def parse_args(argv=None):
+    """CLI flags over --config file values over the defaults above"""
+    parser = argparse.ArgumentParser(description="Train the plant disease model")
+    parser.add_argument("--config", default=None, help="JSON file of settings (keys as below, with underscores)")
+
+    data = parser.add_argument_group("data")
+    data.add_argument("--train-path", default=TRAIN_PATH)
+    data.add_argument("--val-path", default=VAL_PATH)
+    data.add_argument("--pipeline", choices=PIPELINES, default=INPUT_PIPELINE)
+    data.add_argument("--shards-dir", default=SHARDS_DIR)
+    data.add_argument("--img-size", type=int, default=IMG_SIZE)
+    data.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    model = parser.add_argument_group("model")
+    model.add_argument("--alpha", type=float, default=ALPHA, help="MobileNetV2 width multiplier")
+    model.add_argument("--fine-tune-layers", type=int, default=FINE_TUNE_LAYERS,
+                       help="backbone layers unfrozen in stage 2 (0 = keep it frozen, skip stage 2)")
+
+    schedule = parser.add_argument_group("schedule")
+    schedule.add_argument("--epochs-stage1", type=int, default=EPOCHS_STAGE1)
+    schedule.add_argument("--epochs-stage2", type=int, default=EPOCHS_STAGE2)
+    schedule.add_argument("--lr-stage1", type=float, default=LEARNING_RATE_STAGE1)
+    schedule.add_argument("--lr-stage2", type=float, default=LEARNING_RATE_STAGE2)
+    schedule.add_argument("--stage1-features", action=argparse.BooleanOptionalAction, default=STAGE1_FEATURES,
+                          help="train stage 1 on cached backbone features")
+    schedule.add_argument("--feature-copies", type=int, default=FEATURE_AUGMENT_COPIES,
+                          help="fixed augmented copies of the training features")
+    schedule.add_argument("--seed", type=int, default=None)
+
+    runtime = parser.add_argument_group("runtime")
+    runtime.add_argument("--precision", choices=PRECISIONS, default="float32",
+                         help="bfloat16 = mixed precision (float32 weights + softmax); auto = bfloat16 if the CPU supports it")
+    runtime.add_argument("--xla", action=argparse.BooleanOptionalAction, default=False,
+                         help="XLA JIT-compile the training step")
+    runtime.add_argument("--intra-op-threads", type=int, default=0, help="0 = TensorFlow default")
+    runtime.add_argument("--inter-op-threads", type=int, default=0, help="0 = TensorFlow default")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--name", default=None, help="suffix for the run directory")
+    output.add_argument("--runs-dir", default=RUNS_DIR)
+    output.add_argument("--install", action=argparse.BooleanOptionalAction, default=True,
+                        help=f"copy the model and class names to {os.path.dirname(MODEL_PATH)}/")
+    output.add_argument("--latency-runs", type=int, default=LATENCY_RUNS, help="0 skips the latency measurement")
+
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        with open(args.config, "r") as f:
+            file_config = json.load(f)
+
+        # A run's config.json also carries metadata that is not a setting
+        file_config = file_config.get("settings", file_config)
+        unknown = set(file_config) - set(vars(args))
+        if unknown:
+            parser.error(f"unknown settings in {args.config}: {', '.join(sorted(unknown))}")
+        parser.set_defaults(**file_config)
+
+    args = parser.parse_args(argv)
+
+    # Checked after parsing: --config values never go through type=
+    for key in NON_NEGATIVE_SETTINGS:
+        if getattr(args, key) < 0:
+            parser.error(f"--{key.replace('_', '-')} must be 0 or more, got {getattr(args, key)}")
+
+    # Shards are always built from dataset/<split>; another dataset needs its own build
+    if args.pipeline == "shards" and (args.train_path != TRAIN_PATH or args.val_path != VAL_PATH):
+        parser.error("--train-path/--val-path don't apply to --pipeline shards "
+                     "(build shards from that dataset with dataset_shards.py build --source)")
+
+    return args
+
+
+def configure_threads(intra_op_threads, inter_op_threads):
+    """Only takes effect before the TF runtime initializes, so call it first"""
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def make_run_dir(runs_dir, name=None):
+    run_id = time.strftime("%Y%m%d-%H%M%S") + (f"-{name}" if name else "")
+    run_dir = os.path.join(runs_dir, run_id)
+    os.makedirs(run_dir)
+    return run_dir
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
 
-os.makedirs("models", exist_ok=True)
-
-with open("models/class_names.json", "w") as f:
-    json.dump(class_names, f)
-
-print(f"📁 Saved {len(class_names)} class names\n")
 
 # ==============================
-# BUILD MODEL
+# DATA PIPELINE
 # ==============================
 
-base_model = MobileNetV2(
-    input_shape=(IMG_SIZE, IMG_SIZE, 3),
-    include_top=False,
-    weights='imagenet'
-)
-
-base_model.trainable = False
-
-model = models.Sequential([
-    base_model,
-    layers.GlobalAveragePooling2D(),
-    layers.BatchNormalization(),
-    layers.Dense(512, activation='relu'),
-    layers.Dropout(0.5),
-    layers.Dense(len(class_names), activation='softmax')
-])
-
-# ==============================
-# CALLBACKS
-# ==============================
+def load_data(args):
+    """(train, val, class_names, train image count) for the chosen input pipeline"""
+    if args.pipeline == "tfdata":
+        train, class_names = make_dataset(args.train_path, args.img_size, args.batch_size, training=True, seed=args.seed)
+        val, _ = make_dataset(args.val_path, args.img_size, args.batch_size)
+        return train, val, class_names, len(list_dataset(args.train_path)[0])
+
+    if args.pipeline == "shards":
+        # Stale shards would silently train on the old pixels
+        check_source(args.train_path, args.shards_dir, "train")
+        check_source(args.val_path, args.shards_dir, "val")
+
+        train, class_names = make_shard_dataset(args.shards_dir, "train", args.img_size, args.batch_size,
+                                                training=True, seed=args.seed)
+        val, _ = make_shard_dataset(args.shards_dir, "val", args.img_size, args.batch_size)
+        return train, val, class_names, len(ShardedSplit(args.shards_dir, "train"))
+
+    train_datagen = ImageDataGenerator(
+        rescale=1./255,
+        rotation_range=20,
+        zoom_range=0.2,
+        horizontal_flip=True
+    )
+
+    val_datagen = ImageDataGenerator(
+        rescale=1./255
+    )
+
+    train = train_datagen.flow_from_directory(
+        args.train_path,
+        target_size=(args.img_size, args.img_size),
+        batch_size=args.batch_size,
+        class_mode='categorical',
+        seed=args.seed
+    )
+
+    val = val_datagen.flow_from_directory(
+        args.val_path,
+        target_size=(args.img_size, args.img_size),
+        batch_size=args.batch_size,
+        class_mode='categorical'
+    )
+
+    return train, val, list(train.class_indices.keys()), train.samples
 
-callbacks = [
-    EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
-    ReduceLROnPlateau(monitor='val_loss', factor=0.3, patience=2),
-    ModelCheckpoint("models/best_model.keras", save_best_only=True)
-]
 
 # ==============================
-# STAGE 1 - TRAIN HEAD
+# STAGE 1 ON CACHED FEATURES
 # ==============================
 
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=1e-3),
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-print("🚀 Stage 1: Training classifier head...\n")
+def fit_head_on_features(args, base_model, head_layers, precision, timer):
+    def features_for(split, path):
+        if args.pipeline == "shards":
+            ds, _ = make_shard_dataset(args.shards_dir, split, args.img_size, args.batch_size)
+            key = {"source": read_index(args.shards_dir)["splits"][split]["fingerprint"], "pipeline": "shards"}
+        else:
+            ds, _ = make_dataset(path, args.img_size, args.batch_size, cache=False)
+            key = {"source": source_fingerprint(list_dataset(path)[0]), "pipeline": "tfdata"}
+
+        copies = args.feature_copies if split == "train" else 0
+        key = dict(key, img_size=args.img_size, precision=precision)
+        return cached_features(split, base_model, ds, key, copies, seed=args.seed)
+
+    train_features, train_labels = features_for("train", args.train_path)
+    val_features, val_labels = features_for("val", args.val_path)
+
+    head = models.Sequential([layers.Input(shape=(train_features.shape[1],)), *head_layers])
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=args.lr_stage1),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=args.xla
+    )
+
+    # No ModelCheckpoint here: it would save the head alone
+    timer.train_images = len(train_features)
+    head.fit(
+        train_features,
+        train_labels,
+        batch_size=args.batch_size,
+        validation_data=(val_features, val_labels),
+        epochs=args.epochs_stage1,
+        callbacks=[
+            EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.3, patience=2),
+            timer
+        ]
+    )
 
-model.fit(
-    train_generator,
-    validation_data=val_generator,
-    epochs=EPOCHS_STAGE1,
-    callbacks=callbacks
-)
 
 # ==============================
-# STAGE 2 - FINE TUNE
+# SAVED MODEL
 # ==============================
 
-print("\n🔥 Stage 2: Fine-tuning last layers...\n")
-
-base_model.trainable = True
+def measure_model(path, latency_runs=LATENCY_RUNS):
+    """File size, parameter count and serving-path latency of a saved model"""
+    backend = KerasBackend(path)
+    measured = {
+        "size_bytes": os.path.getsize(path),
+        "params": int(backend.model.count_params())
+    }
 
-for layer in base_model.layers[:-30]:
-    layer.trainable = False
+    if latency_runs:
+        measured["latency"] = time_predict(backend.predict, backend.input_shape, LATENCY_BATCH_SIZES,
+                                           timed_runs=latency_runs)
 
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=1e-4),
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
+    return measured
 
-model.fit(
-    train_generator,
-    validation_data=val_generator,
-    epochs=EPOCHS_STAGE2,
-    callbacks=callbacks
-)
 
 # ==============================
-# SAVE FINAL MODEL
+# TRAINING
 # ==============================
 
-model.save("models/plant_disease_model.keras")
-
-print("\n✅ TRAINING COMPLETE")
-print("📁 Model saved as models/plant_disease_model.keras")
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("🌿 Plant Disease Training Starting...\n")
+
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+    if args.seed is not None:
+        tf.keras.utils.set_random_seed(args.seed)
+
+    run_dir = make_run_dir(args.runs_dir, args.name)
+    epochs_log = os.path.join(run_dir, "epochs.jsonl")
+    started = time.perf_counter()
+
+    settings = {key: value for key, value in vars(args).items() if key != "config"}
+    write_json(os.path.join(run_dir, "config.json"), {
+        "settings": settings,
+        "git_commit": git_commit(),
+        "tensorflow": tf.__version__,
+        "cpu_count": os.cpu_count(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S")
+    })
+
+    print(f"📁 Run directory: {run_dir}\n")
+
+    # ==============================
+    # DATA + CLASS NAMES
+    # ==============================
+
+    train_generator, val_generator, class_names, train_images = load_data(args)
+
+    write_json(os.path.join(run_dir, "class_names.json"), class_names)
+    print(f"📁 Saved {len(class_names)} class names\n")
+
+    # ==============================
+    # BUILD MODEL
+    # ==============================
+
+    precision = configure_precision(args.precision)
+    print(f"🔢 Precision: {precision}, XLA: {'on' if args.xla else 'off'}\n")
+
+    # head_layers are shared by the full model and the stage-1 feature head, so
+    # weights trained on cached features are already in place for stage 2
+    model, base_model, head_layers = build_model(len(class_names), args.img_size, alpha=args.alpha)
+
+    def callbacks(timer):
+        return [
+            EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.3, patience=2),
+            ModelCheckpoint(os.path.join(run_dir, "best_model.keras"), save_best_only=True),
+            timer
+        ]
+
+    # ==============================
+    # STAGE 1 - TRAIN HEAD
+    # ==============================
+
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=args.lr_stage1),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=args.xla
+    )
+
+    print("🚀 Stage 1: Training classifier head...\n")
+
+    stage1_timer = EpochTimer(train_images, stage=1, log_path=epochs_log)
+    stage1_started = time.perf_counter()
+
+    if args.stage1_features:
+        fit_head_on_features(args, base_model, head_layers, precision, stage1_timer)
+    else:
+        model.fit(
+            train_generator,
+            validation_data=val_generator,
+            epochs=args.epochs_stage1,
+            callbacks=callbacks(stage1_timer)
+        )
+
+    # Same full-model evaluation either way, for comparing the two stage-1 modes
+    stage1_seconds = time.perf_counter() - stage1_started
+    _, stage1_accuracy = model.evaluate(val_generator, verbose=0)
+    print(f"\n📊 Stage 1 ({'cached features' if args.stage1_features else 'images'}): "
+          f"val accuracy {stage1_accuracy:.4f} in {stage1_seconds:.0f}s")
+
+    # ==============================
+    # STAGE 2 - FINE TUNE
+    # ==============================
+
+    stage2_timer = EpochTimer(train_images, stage=2, log_path=epochs_log)
+    stage2_started = time.perf_counter()
+
+    if unfreeze_top(base_model, args.fine_tune_layers):
+        print(f"\n🔥 Stage 2: Fine-tuning last {args.fine_tune_layers} layers...\n")
+
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=args.lr_stage2),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            jit_compile=args.xla
+        )
+
+        model.fit(
+            train_generator,
+            validation_data=val_generator,
+            epochs=args.epochs_stage2,
+            callbacks=callbacks(stage2_timer)
+        )
+    else:
+        print("\n⏭️  Stage 2 skipped (--fine-tune-layers 0): the backbone stays frozen")
+
+    stage2_seconds = time.perf_counter() - stage2_started
+    val_loss, val_accuracy = model.evaluate(val_generator, verbose=0)
+
+    # ==============================
+    # SAVE FINAL MODEL
+    # ==============================
+
+    # Saved with a float32 policy whatever the training precision (see train_setup.float32_model)
+    model_path = os.path.join(run_dir, "model.keras")
+    float32_model(model, len(class_names), args.img_size, args.alpha).save(model_path)
+
+    print("\n⏱️  Measuring the saved model...")
+    measured = measure_model(model_path, args.latency_runs)
+
+    summary = {
+        "run_dir": run_dir,
+        "precision": precision,
+        "train_images": train_images,
+        "total_seconds": round(time.perf_counter() - started, 1),
+        "stages": {
+            "stage1": {
+                "mode": "features" if args.stage1_features else "images",
+                "epochs": len(stage1_timer.epochs),
+                "seconds": round(stage1_seconds, 1),
+                "images_per_sec": stage1_timer.steady_images_per_sec(),
+                "val_accuracy": round(float(stage1_accuracy), 4)
+            },
+            "stage2": {
+                "epochs": len(stage2_timer.epochs),
+                "seconds": round(stage2_seconds, 1),
+                "images_per_sec": stage2_timer.steady_images_per_sec()
+            }
+        },
+        "val_accuracy": round(float(val_accuracy), 4),
+        "val_loss": round(float(val_loss), 4),
+        "model": measured
+    }
+    write_json(os.path.join(run_dir, "summary.json"), summary)
+
+    if args.install:
+        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+        shutil.copyfile(model_path, MODEL_PATH)
+        shutil.copyfile(os.path.join(run_dir, "class_names.json"), CLASS_NAMES_PATH)
+
+    print("\n✅ TRAINING COMPLETE")
+    print(f"📊 Val accuracy {val_accuracy:.4f}, {measured['size_bytes'] / 1e6:.1f} MB")
+    for batch_size, row in measured.get("latency", {}).items():
+        print(f"⚡ Batch {batch_size}: p50 {row['latency_ms_p50']} ms, {row['images_per_sec']} img/s")
+    print(f"📁 Run saved in {run_dir}")
+    if args.install:
+        print(f"📁 Model installed as {MODEL_PATH}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import tensorflow as tf
+from tensorflow.keras import layers, models
+from tensorflow.keras.applications import MobileNetV2
+
+
+# ==============================
+# CONFIG
+# ==============================
+# Model construction and numeric settings shared by train_model.py and
+# bench_training.py.
+#
+# bfloat16 keeps float32's exponent range, so unlike float16 it needs no loss
+# scaling; on CPUs with AVX512_BF16 / AMX, oneDNN runs its matmuls and
+# convolutions at up to 2x float32 speed. Elsewhere it is emulated and slower,
+# which is why "auto" only picks it when the CPU has native support.
+
+PRECISIONS = ("float32", "bfloat16", "auto")
+
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+# ==============================
+# PRECISION
+# ==============================
+
+def bf16_supported():
+    """True if this CPU has native bfloat16 instructions"""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return any(flag in flags for flag in BF16_CPU_FLAGS)
+
+
+def configure_precision(precision="float32"):
+    """Set the global Keras policy before the model is built; returns the precision used"""
+    if precision == "auto":
+        precision = "bfloat16" if bf16_supported() else "float32"
+
+    if precision == "bfloat16" and not bf16_supported():
+        print("⚠️  No native bfloat16 on this CPU — it will be emulated and likely slower")
+
+    tf.keras.mixed_precision.set_global_policy("mixed_bfloat16" if precision == "bfloat16" else "float32")
+    return precision
+
+
+# ==============================
+# MODEL
+# ==============================
+
+def build_model(num_classes, img_size=224, weights="imagenet", alpha=1.0):
+    """(model, frozen base_model, head_layers) under the current precision policy
+
+    alpha is MobileNetV2's width multiplier: ImageNet weights exist for 0.35,
+    0.5, 0.75, 1.0, 1.3 and 1.4. The softmax layer is always float32: a bfloat16 softmax rounds small
+    class probabilities (and the loss computed from them) to ~3 significant
+    digits. The head layers are returned so a features-only head can share them.
+    """
+    base_model = MobileNetV2(
+        input_shape=(img_size, img_size, 3),
+        alpha=alpha,
+        include_top=False,
+        weights=weights
+    )
+
+    base_model.trainable = False
+
+    head_layers = [
+        layers.BatchNormalization(),
+        layers.Dense(512, activation='relu'),
+        layers.Dropout(0.5),
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ]
+
+    model = models.Sequential([
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        *head_layers
+    ])
+
+    return model, base_model, head_layers
+
+
+def unfreeze_top(base_model, count):
+    """Make only the last `count` backbone layers trainable (stage 2); returns False if none
+
+    count <= 0 keeps the whole backbone frozen (note layers[:-0] would be
+    empty, i.e. everything trainable).
+    """
+    if count <= 0:
+        base_model.trainable = False
+        return False
+
+    base_model.trainable = True
+
+    for layer in base_model.layers[:max(0, len(base_model.layers) - count)]:
+        layer.trainable = False
+    return True
+
+
+def float32_model(model, num_classes, img_size=224, alpha=1.0):
+    """The model rebuilt with a float32 policy and the same weights, for saving
+
+    Variables are float32 under mixed precision already; this only drops the
+    bfloat16 compute policy from the saved layers, so serving hosts without
+    bfloat16 support run the model at full speed and identical numerics.
+    """
+    if tf.keras.mixed_precision.global_policy().name == "float32":
+        return model
+
+    tf.keras.mixed_precision.set_global_policy("float32")
+    export, _, _ = build_model(num_classes, img_size, weights=None, alpha=alpha)
+    export.set_weights(model.get_weights())
+    return export
@@ -0,0 +1,347 @@
+import asyncio
+import io
+import os
+import threading
+from functools import partial
+
+import metrics
+
+
+# ==============================
+# CONFIG
+# ==============================
+# UPLOAD_MAX_BYTES: largest single image accepted (the Node API caps at 10 MB).
+# UPLOAD_BUDGET_MB: upload bytes one worker may hold at once, summed over
+# every in-flight request. A burst of large photos waits for budget (then
+# gets 503) instead of growing the worker until the OOM killer steps in.
+
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+UPLOAD_BUDGET_MB = float(os.environ.get("UPLOAD_BUDGET_MB", 256))
+UPLOAD_ADMIT_TIMEOUT_MS = float(os.environ.get("UPLOAD_ADMIT_TIMEOUT_MS", 2000))
+
+# Bytes needed to recognise every accepted format
+SNIFF_BYTES = 12
+
+# Multipart boundaries + part headers on top of the image itself
+MULTIPART_SLACK = 16 * 1024
+
+# Raw pixels from a client that already resized on-device (see /predict/config):
+# H x W x 3 RGB uint8, row-major, exactly the model input size
+TENSOR_CONTENT_TYPE = "application/x-rgb-uint8"
+
+
+
+class UploadRejected(Exception):
+    """Payload refused before decode; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadBudgetExhausted(Exception):
+    """Too many upload bytes already held by in-flight requests"""
+
+
+# ==============================
+# MAGIC BYTES
+# ==============================
+
+def sniff_image(head):
+    """Image format from the first SNIFF_BYTES of a payload, or None"""
+    head = bytes(head[:SNIFF_BYTES])
+
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith(b"BM"):
+        return "bmp"
+    return None
+
+
+def _mimetype(content_type):
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def is_raw_image(content_type):
+    """Body is the image itself (image/* or octet-stream) rather than multipart"""
+    mimetype = _mimetype(content_type)
+    return mimetype.startswith("image/") or mimetype == "application/octet-stream"
+
+
+def is_raw_tensor(content_type):
+    """Body is decoded pixels (TENSOR_CONTENT_TYPE), not an encoded image"""
+    return _mimetype(content_type) == TENSOR_CONTENT_TYPE
+
+
+def parse_length(header):
+    """Content-Length header as an int (None if absent); 400 if it isn't one"""
+    if not header:
+        return None
+    try:
+        length = int(header)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise UploadRejected(f"Invalid Content-Length: {header!r}", 400)
+    return length
+
+
+def check_length(length, max_bytes=UPLOAD_MAX_BYTES):
+    """413 from the declared Content-Length, before any of the body is read"""
+    if length is not None and length > max_bytes:
+        raise UploadRejected(f"Image too large ({length} bytes), max is {max_bytes}", 413)
+
+
+def check_head(head):
+    if sniff_image(head) is None:
+        raise UploadRejected("Not a JPEG, PNG, WebP or BMP image", 415)
+
+
+def _skip_check(head):
+    pass
+
+
+# ==============================
+# READING
+# ==============================
+
+def _readinto(stream, view):
+    """Fill `view` from `stream`; returns the byte count (short only at EOF)"""
+    # Older Werkzeug request streams have no readinto(); copy read() chunks in
+    readinto = getattr(stream, "readinto", None) or partial(_readinto_fallback, stream)
+
+    filled = 0
+    while filled < len(view):
+        n = readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def _readinto_fallback(stream, view):
+    chunk = stream.read(min(len(view), 64 * 1024))
+    view[:len(chunk)] = chunk
+    return len(chunk)
+
+
+def read_stream(stream, length=None, max_bytes=UPLOAD_MAX_BYTES, sniff=True):
+    """Read a raw image body into one buffer, checking magic bytes first
+
+    With a Content-Length the body lands in a single preallocated bytearray
+    (decoded in place by preprocessing.decode_image); without one it is read
+    in chunks and cut off as soon as it passes max_bytes, so a chunked client
+    can't exceed the limit either. sniff=False skips the magic-byte check
+    (raw tensors have none).
+    """
+    check = check_head if sniff else _skip_check
+    check_length(length, max_bytes)
+
+    if length is not None:
+        buf = bytearray(length)
+        view = memoryview(buf)
+
+        filled = _readinto(stream, view[:SNIFF_BYTES])
+        check(view[:filled])
+        filled += _readinto(stream, view[filled:])
+
+        if filled < length:
+            raise UploadRejected(f"Upload ended after {filled} of {length} bytes", 400)
+        return buf
+
+    head = stream.read(SNIFF_BYTES)
+    check(head)
+
+    buf = io.BytesIO()
+    buf.write(head)
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        buf.write(chunk)
+        if buf.tell() > max_bytes:
+            raise UploadRejected(f"Image too large, max is {max_bytes} bytes", 413)
+
+    return buf.getvalue()
+
+
+class BodyBuffer:
+    """read_stream for servers that hand the body over in chunks (ASGI)"""
+
+    def __init__(self, length=None, max_bytes=UPLOAD_MAX_BYTES, sniff=True):
+        check_length(length, max_bytes)
+        self.check = check_head if sniff else _skip_check
+        self.length = length
+        self.limit = length if length is not None else max_bytes
+        self.buffer = bytearray(length) if length is not None else bytearray()
+        self.filled = 0
+        self.checked = False
+
+    def feed(self, chunk):
+        end = self.filled + len(chunk)
+        if end > self.limit:
+            raise UploadRejected(f"Image too large, max is {self.limit} bytes", 413)
+
+        if self.length is None:
+            self.buffer += chunk
+        else:
+            self.buffer[self.filled:end] = chunk
+        self.filled = end
+
+        if not self.checked and self.filled >= SNIFF_BYTES:
+            self.check(self.buffer[:SNIFF_BYTES])
+            self.checked = True
+
+    def finish(self):
+        if not self.checked:
+            self.check(self.buffer[:self.filled])
+        if self.length is not None and self.filled < self.length:
+            raise UploadRejected(f"Upload ended after {self.filled} of {self.length} bytes", 400)
+        return self.buffer
+
+
+def read_file(stream, max_bytes=UPLOAD_MAX_BYTES):
+    """Bytes of a parsed multipart file, sniffed before it is pulled into memory
+
+    Parsers keep small parts in a BytesIO (returned without a copy) and spool
+    large ones to a temp file (read once, straight into the result).
+    """
+    head = stream.read(SNIFF_BYTES)
+    check_head(head)
+
+    size = stream.seek(0, io.SEEK_END)
+    if size > max_bytes:
+        raise UploadRejected(f"Image too large ({size} bytes), max is {max_bytes}", 413)
+
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+
+    # Exact-size read: read(n) with a larger n would allocate n bytes up front
+    stream.seek(0)
+    return stream.read(size)
+
+
+def read_member(stream, declared_size, max_bytes=UPLOAD_MAX_BYTES):
+    """Bytes of one archive member, refused from its header size before inflating
+
+    Archive headers can lie, so the member is still read in capped chunks
+    (read_stream without a length) and sniffed like any other upload.
+    """
+    check_length(declared_size, max_bytes)
+    return read_stream(stream, None, max_bytes)
+
+
+# ==============================
+# MEMORY BUDGET
+# ==============================
+
+class UploadBudget:
+    """Byte-weighted semaphore over upload bodies held by in-flight requests
+
+    acquire() blocks a thread; acquire_async() waits on the event loop
+    instead, so an ASGI server can park many uploads on a full budget without
+    tying up a thread each. Both draw on the same bytes.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = max(1, int(budget_bytes))
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._async_waiters = []
+
+    def in_use(self):
+        return self._in_use
+
+    def acquire(self, nbytes, timeout=None):
+        # A single upload larger than the whole budget still gets in alone
+        nbytes = min(int(nbytes), self.budget_bytes)
+
+        with self._cond:
+            admitted = self._cond.wait_for(
+                lambda: self._in_use + nbytes <= self.budget_bytes, timeout=timeout
+            )
+            if not admitted:
+                raise UploadBudgetExhausted(
+                    f"{self._in_use // (1024 * 1024)} MB of uploads already in flight"
+                )
+            self._in_use += nbytes
+        return nbytes
+
+    async def acquire_async(self, nbytes, timeout=None):
+        nbytes = min(int(nbytes), self.budget_bytes)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        while True:
+            with self._cond:
+                if self._in_use + nbytes <= self.budget_bytes:
+                    self._in_use += nbytes
+                    return nbytes
+                waiter = (loop, asyncio.Event())
+                self._async_waiters.append(waiter)
+
+            # Woken by every release; loops to re-check, as wait_for does
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - loop.time())
+                await asyncio.wait_for(waiter[1].wait(), remaining)
+            except asyncio.TimeoutError:
+                raise UploadBudgetExhausted(
+                    f"{self._in_use // (1024 * 1024)} MB of uploads already in flight"
+                )
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def release(self, nbytes):
+        with self._cond:
+            self._in_use -= nbytes
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+
+        # Releases can come from any thread; each event is set on its own loop
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def hold(self, nbytes, timeout=None):
+        """Context manager reserving `nbytes` for the duration of a request"""
+        return _Reservation(self, nbytes, timeout)
+
+
+class _Reservation:
+    def __init__(self, budget, nbytes, timeout):
+        self.budget = budget
+        self.nbytes = nbytes
+        self.timeout = timeout
+        self.held = 0
+
+    def __enter__(self):
+        self.held = self.budget.acquire(self.nbytes, self.timeout)
+        return self
+
+    def __exit__(self, *exc):
+        self.budget.release(self.held)
+
+    def extend(self, nbytes):
+        """Hold `nbytes` more, e.g. for an archive inflating past its compressed size"""
+        if self.held + nbytes > self.budget.budget_bytes:
+            raise UploadRejected(f"Upload inflates past the {self.budget.budget_bytes} byte upload budget", 413)
+        self.held += self.budget.acquire(nbytes, self.timeout)
+
+
+upload_budget = UploadBudget(UPLOAD_BUDGET_MB * 1024 * 1024)
+metrics.UPLOAD_BYTES_IN_FLIGHT.fn = upload_budget.in_use
+
+
+def reservation_size(content_length):
+    """Budget one request body needs (UPLOAD_MAX_BYTES if the length is unknown)"""
+    return content_length if content_length is not None else UPLOAD_MAX_BYTES
+
+
+def reserve(content_length):
+    """Context manager holding budget for one request body"""
+    return upload_budget.hold(reservation_size(content_length), timeout=UPLOAD_ADMIT_TIMEOUT_MS / 1000)
@@ -0,0 +1,24 @@
+import sys
+
+import inference_service as service
+from app import app
+
+
+# ==============================
+# WSGI ENTRY POINT
+# ==============================
+# With preload_app the model is loaded once in the gunicorn master and the
+# weights are shared copy-on-write by every forked worker; otherwise each
+# worker imports this module and loads its own copy.
+
+if service.model_state == "not_loaded":
+    print("\n🌿 Plant Disease AI Service Starting (gunicorn)...\n")
+
+    if service.MODEL_LOAD_MODE == "background":
+        service.start_background_load()
+
+    elif not service.load_model():
+        print("❌ Model failed to load — refusing to serve.")
+        sys.exit(1)
+
+application = app
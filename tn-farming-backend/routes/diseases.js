@@ -3,28 +3,21 @@ const router = express.Router();
 console.log('🔥 DISEASES ROUTES LOADED!');
 const multer = require('multer');
 const axios = require('axios');
-const fs = require('fs');
-const path = require('path');
-const FormData = require('form-data');
 
 const AI_SERVICE_URL = 'http://localhost:5001';
 
-const storage = multer.diskStorage({
-  destination: (req, file, cb) => {
-    const uploadDir = 'uploads/diseases/';
-    if (!fs.existsSync(uploadDir)) fs.mkdirSync(uploadDir, { recursive: true });
-    cb(null, uploadDir);
-  },
-  filename: (req, file, cb) => {
-    cb(null, `disease_${Date.now()}${path.extname(file.originalname)}`);
-  }
-});
+// Kept in memory and forwarded as the raw request body: no temp file write,
+// no re-read, no second multipart encoding (the AI service reads it into one buffer)
+const storage = multer.memoryStorage();
 
 const upload = multer({
   storage,
   limits: { fileSize: 10 * 1024 * 1024 },
   fileFilter: (req, file, cb) => {
-    file.mimetype.startsWith('image/') ? cb(null, true) : cb(new Error('Only image files are allowed'));
+    // application/x-rgb-uint8: pixels the app already resized (see /detect/config)
+    (file.mimetype.startsWith('image/') || file.mimetype === 'application/x-rgb-uint8')
+      ? cb(null, true)
+      : cb(new Error('Only image files are allowed'));
   }
 });
 
@@ -107,6 +100,24 @@ router.get('/crop/:cropId', async (req, res) => {
   }
 });
 
+// ─────────────────────────────────────────────────────────────
+// GET /api/diseases/detect/config
+// Model input size + JPEG quality, so the app can downscale before upload
+// ─────────────────────────────────────────────────────────────
+router.get('/detect/config', async (req, res) => {
+  try {
+    const aiResponse = await axios.get(`${AI_SERVICE_URL}/predict/config`, { timeout: 5000 });
+    res.set('Cache-Control', aiResponse.headers['cache-control'] || 'no-cache');
+    res.json(aiResponse.data);
+  } catch (error) {
+    res.status(error.response?.status || 503).json({
+      success: false,
+      message: 'AI service unavailable',
+      error: error.response?.data?.error || error.message
+    });
+  }
+});
+
 // ─────────────────────────────────────────────────────────────
 // POST /api/diseases/detect
 // ─────────────────────────────────────────────────────────────
@@ -118,14 +129,13 @@ router.post('/detect', upload.single('image'), async (req, res) => {
       return res.status(400).json({ success: false, message: 'No image file provided' });
     }
 
-    console.log('📸 File:', req.file.filename, '|', req.file.size, 'bytes');
+    console.log('📸 File:', req.file.originalname, '|', req.file.size, 'bytes');
 
     // Check Python AI service
     try {
       await axios.get(`${AI_SERVICE_URL}/health`, { timeout: 5000 });
       console.log('✅ Python AI service running');
     } catch {
-      if (fs.existsSync(req.file.path)) fs.unlinkSync(req.file.path);
       return res.status(503).json({
         success: false,
         message: 'AI service unavailable. Please start Python AI server.',
@@ -133,23 +143,17 @@ router.post('/detect', upload.single('image'), async (req, res) => {
       });
     }
 
-    // Forward image to Python
-    const formData = new FormData();
-    formData.append('image', fs.createReadStream(req.file.path));
-
-    const aiResponse = await axios.post(`${AI_SERVICE_URL}/predict`, formData, {
-      headers: { ...formData.getHeaders() },
+    // Forward image to Python as a raw body
+    const aiResponse = await axios.post(`${AI_SERVICE_URL}/predict`, req.file.buffer, {
+      headers: {
+        'Content-Type': req.file.mimetype,
+        'Content-Length': req.file.size
+      },
       timeout: 30000,
       maxContentLength: Infinity,
       maxBodyLength: Infinity
     });
 
-    // Cleanup
-    if (fs.existsSync(req.file.path)) {
-      fs.unlinkSync(req.file.path);
-      console.log('🗑️  Temp file deleted');
-    }
-
     const prediction = aiResponse.data.prediction || {};
     const primary    = prediction.primary || {};
 
@@ -207,7 +211,6 @@ router.post('/detect', upload.single('image'), async (req, res) => {
 
   } catch (error) {
     console.error('❌ Detection error:', error.message);
-    if (req.file && fs.existsSync(req.file.path)) fs.unlinkSync(req.file.path);
     res.status(500).json({
       success: false,
       message: 'Disease detection failed',